@@ -1,7 +1,25 @@
-from serial_json import *
+import sys
+
+from .serial_json import *
+from .columns import MaskedArray, columns
+from .follow import follow
+from .index import Index, build_index
+from .parallel import parallel_array, parallel_load
+from .readahead import detect_compression, open_input
+from .tee import Consumer, tee
+from .writer import Writer
 
 __all__ = [
-    'load', 'loads', 'Parser', 'Token', 'Terminator', 'ObjectTerminator',
-    'ArrayTerminator', 'StartTerminator', 'EndTerminator', 'StartObject',
-    'EndObject', 'StartArray', 'EndArray'
+    'load', 'loads', 'load_path', 'items', 'Parser', 'Path', 'Token',
+    'Terminator',
+    'ObjectTerminator', 'ArrayTerminator', 'StartTerminator', 'EndTerminator',
+    'StartObject', 'EndObject', 'StartArray', 'EndArray', 'StringChunk',
+    'StringEnd', 'NumberBlock',
+    'parallel_array', 'parallel_load', 'Index', 'build_index',
+    'open_input', 'detect_compression', 'Writer', 'tee', 'Consumer',
+    'columns', 'MaskedArray', 'follow'
 ]
+
+if sys.version_info >= (3, 6):
+    from .aio import aload
+    __all__.append('aload')
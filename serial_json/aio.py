@@ -0,0 +1,18 @@
+'''Asyncio support (Python 3.6+). '''
+
+from .serial_json import Parser
+
+
+async def aload(reader, chunk_size=64 * 1024, **kwargs):
+    '''Asynchronously yields `(path, value)` events from `reader`, an
+    `asyncio.StreamReader` or any object with a coroutine `read(size)`
+    method. Keyword arguments are passed to the `Parser`. '''
+    parser = Parser(None, **kwargs)
+    while True:
+        data = await reader.read(chunk_size)
+        if not data:
+            break
+        for event in parser.feed(data):
+            yield event
+    for event in parser.close():
+        yield event
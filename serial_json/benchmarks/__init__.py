@@ -0,0 +1,9 @@
+'''Benchmarks of the parser against the `json` module, over deterministic
+synthetic corpora, e.g.
+
+    python -m serial_json.benchmarks --corpus numbers deep --size 1 10
+    python -m serial_json.benchmarks --baseline baseline.json
+
+Results are written as json, and a run fails (with exit status 1) when it is
+slower or uses more memory than a stored baseline allows.
+'''
@@ -0,0 +1,123 @@
+'''Runs the benchmarks, writing their results as json and comparing them
+with a baseline. See `python -m serial_json.benchmarks --help`. '''
+
+from __future__ import print_function, unicode_literals
+
+import argparse
+import json
+import subprocess
+import sys
+
+from .cases import CASES, DEFAULT_CASES
+from .corpus import CORPORA, corpus_path
+
+
+def run(corpora, sizes, cases, repeat=3, directory=None, log=None):
+    '''Runs each case on each corpus size, each time in a new process, and
+    returns a list of result dicts, with the best time of `repeat` runs and
+    the largest peak memory. '''
+    results = []
+    for corpus in corpora:
+        for size in sizes:
+            filename = corpus_path(corpus, size, directory)
+            for case in cases:
+                runs = [_run_process(case, filename) for _ in range(repeat)]
+                best = min(runs, key=lambda result: result['seconds'])
+                best['peak_rss_kb'] = max(
+                    result['peak_rss_kb'] for result in runs)
+                best.update(corpus=corpus, size_mb=size, case=case)
+                results.append(best)
+                if log is not None:
+                    log(best)
+    return results
+
+
+def _run_process(case, filename):
+    '''Runs a case in a new python process. '''
+    output = subprocess.check_output([
+        sys.executable, '-m', 'serial_json.benchmarks.cases', case,
+        filename])
+    return json.loads(output.decode('utf-8'))
+
+
+def _key(result):
+    '''Identifies the configuration of a result. '''
+    return result['corpus'], result['size_mb'], result['case']
+
+
+def compare(results, baseline, tolerance=0.2, memory_tolerance=0.2):
+    '''Returns a description of each result that regresses from the result
+    of the same configuration in `baseline`: with a throughput more than
+    `tolerance` (a fraction) lower, or a peak memory more than
+    `memory_tolerance` higher. '''
+    previous = dict((_key(result), result) for result in baseline)
+    regressions = []
+    for result in results:
+        old = previous.get(_key(result))
+        if old is None:
+            continue
+        name = '{} {:g} MB {}'.format(*_key(result))
+        if result['mb_per_second'] < old['mb_per_second'] * (1 - tolerance):
+            regressions.append('{}: {:.2f} MB/s, from {:.2f} MB/s'.format(
+                name, result['mb_per_second'], old['mb_per_second']))
+        if result['peak_rss_kb'] > old['peak_rss_kb'] * (
+                1 + memory_tolerance):
+            regressions.append('{}: peak memory {} KB, from {} KB'.format(
+                name, result['peak_rss_kb'], old['peak_rss_kb']))
+    return regressions
+
+
+def _print_result(result):
+    '''Prints a one line summary of a result. '''
+    print('{corpus:>12} {size_mb:>6g} MB {case:>15}: {mb_per_second:8.2f} '
+          'MB/s {events:>10} events {peak_rss_kb:>9} KB'.format(
+              **dict(result, events=result['events'] or '-')),
+          file=sys.stderr)
+
+
+def main(argv=None):
+    '''Command line entry point. Returns the exit status. '''
+    parser = argparse.ArgumentParser(
+        prog='python -m serial_json.benchmarks', description=__doc__)
+    parser.add_argument('--corpus', nargs='+', choices=CORPORA,
+                        default=CORPORA, help='Corpora to parse')
+    parser.add_argument('--size', nargs='+', type=float, default=[1],
+                        help='Corpus sizes, in MB (1 to 1024)')
+    parser.add_argument('--case', nargs='+', choices=sorted(CASES),
+                        default=DEFAULT_CASES, help='Configurations to run')
+    parser.add_argument('--repeat', type=int, default=3,
+                        help='Runs of each case, of which the best is kept')
+    parser.add_argument('--corpus-dir',
+                        help='Where corpora are generated and kept')
+    parser.add_argument('--output', help='Write the results to a json file')
+    parser.add_argument('--baseline',
+                        help='Fail if the results regress from this file')
+    parser.add_argument('--tolerance', type=float, default=0.2,
+                        help='The allowed fraction of lost throughput')
+    parser.add_argument('--memory-tolerance', type=float, default=0.2,
+                        help='The allowed fraction of added peak memory')
+    args = parser.parse_args(argv)
+
+    results = run(args.corpus, args.size, args.case, args.repeat,
+                  args.corpus_dir, log=_print_result)
+    output = json.dumps({'python': sys.version.split()[0],
+                         'results': results}, indent=2, sort_keys=True)
+    if args.output:
+        with open(args.output, 'w') as fp:
+            fp.write(output)
+    else:
+        print(output)
+    if args.baseline:
+        with open(args.baseline) as fp:
+            baseline = json.load(fp)['results']
+        regressions = compare(results, baseline, args.tolerance,
+                              args.memory_tolerance)
+        for regression in regressions:
+            print('Regression: ' + regression, file=sys.stderr)
+        if regressions:
+            return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,156 @@
+'''The parsing configurations that are benchmarked, each timed in a fresh
+process so that its peak memory can be measured, e.g.
+
+    python -m serial_json.benchmarks.cases hybrid corpus.json
+'''
+
+from __future__ import print_function, unicode_literals
+
+import gzip
+import io
+import json
+import os
+import resource
+import shutil
+import sys
+import time
+
+import serial_json
+
+
+def _events(parser):
+    '''Counts the events of a parser. '''
+    count = 0
+    for _ in parser:
+        count += 1
+    return count
+
+
+def _lines(fp, function):
+    '''Decodes each line of a JSON Lines file with `function`. '''
+    count = 0
+    for line in fp:
+        if line.strip():
+            function(line)
+            count += 1
+    return count
+
+
+def _load(filename, **kwargs):
+    '''Parses a file with `load`, counting events. '''
+    with io.open(filename, 'rb') as fp:
+        return _events(serial_json.load(fp, **kwargs))
+
+
+def _loads(filename, **kwargs):
+    '''Reads a file into a string, and parses it with `loads`. '''
+    with io.open(filename, 'rb') as fp:
+        text = fp.read().decode('utf-8')
+    return _events(serial_json.loads(text, **kwargs))
+
+
+def _gzipped(filename):
+    '''Writes a gzip compressed copy of a corpus next to it, unless an up to
+    date one is already there. '''
+    compressed = filename + '.gz'
+    if (not os.path.exists(compressed) or
+            os.path.getmtime(compressed) < os.path.getmtime(filename)):
+        with io.open(filename, 'rb') as source:
+            with gzip.open(compressed, 'wb') as out:
+                shutil.copyfileobj(source, out)
+
+
+def _load_gzip(filename, **kwargs):
+    '''Parses the compressed copy of a file with `load`, counting events.
+    Without `read_ahead` it is decompressed on the parsing thread. '''
+    with io.open(filename + '.gz', 'rb') as fp:
+        if kwargs.get('read_ahead'):
+            return _events(serial_json.load(fp, **kwargs))
+        with gzip.GzipFile(fileobj=fp, mode='rb') as data:
+            return _events(serial_json.load(data, **kwargs))
+
+
+def _json(filename, ndjson):
+    '''Decodes a file with the `json` module, which yields no events. '''
+    with io.open(filename, 'rb') as fp:
+        if ndjson:
+            _lines(fp, json.loads)
+        else:
+            json.loads(fp.read().decode('utf-8'))
+    return None
+
+
+# functions of `(filename, ndjson)`, returning the number of events
+CASES = {
+    'load': lambda filename, ndjson: _load(
+        filename, multi_document=ndjson),
+    'loads': lambda filename, ndjson: _loads(
+        filename, multi_document=ndjson),
+    'terminators': lambda filename, ndjson: _load(
+        filename, multi_document=ndjson, terminators=True),
+    'lazy_paths': lambda filename, ndjson: _load(
+        filename, multi_document=ndjson, lazy_paths=True),
+    'hybrid': lambda filename, ndjson: _load(
+        filename, multi_document=ndjson, hybrid=4096),
+    'mmap': lambda filename, ndjson: _load(
+        filename, multi_document=ndjson, mmap=True),
+    'number_blocks': lambda filename, ndjson: _load(
+        filename, multi_document=ndjson, number_blocks=1024),
+    'max_string': lambda filename, ndjson: _load(
+        filename, multi_document=ndjson, max_string=64 * 1024),
+    'list_paths': lambda filename, ndjson: _load(
+        filename, multi_document=ndjson, list_paths=True),
+    'stats': lambda filename, ndjson: _load(
+        filename, multi_document=ndjson, stats=True),
+    'int_or_float': lambda filename, ndjson: _load(
+        filename, multi_document=ndjson, number_mode='int_or_float'),
+    'decimal': lambda filename, ndjson: _load(
+        filename, multi_document=ndjson, number_mode='decimal'),
+    'raw': lambda filename, ndjson: _load(
+        filename, multi_document=ndjson, number_mode='raw'),
+    'gzip': lambda filename, ndjson: _load_gzip(
+        filename, multi_document=ndjson),
+    'gzip_read_ahead': lambda filename, ndjson: _load_gzip(
+        filename, multi_document=ndjson, read_ahead=2),
+    'json': _json,
+}
+DEFAULT_CASES = ['load', 'loads', 'hybrid', 'json']
+
+# untimed preparation of the input of a case, given the corpus file name
+PREPARE = {
+    'gzip': _gzipped,
+    'gzip_read_ahead': _gzipped,
+}
+
+
+def peak_rss():
+    '''Returns the peak resident set size of this process, in kilobytes. '''
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    if sys.platform == 'darwin':
+        # reported in bytes
+        peak //= 1024
+    return peak
+
+
+def run_case(case, filename, ndjson=False):
+    '''Runs a case once, returning a dict of its measurements. '''
+    if case not in CASES:
+        raise ValueError('Unknown case: {}'.format(case))
+    if case in PREPARE:
+        PREPARE[case](filename)
+    size = os.path.getsize(filename)
+    start = time.time()
+    events = CASES[case](filename, ndjson)
+    seconds = time.time() - start
+    return {
+        'seconds': seconds,
+        'events': events,
+        'mb_per_second': size / 2.0 ** 20 / seconds,
+        'events_per_second': events / seconds if events else None,
+        'peak_rss_kb': peak_rss(),
+    }
+
+
+if __name__ == '__main__':
+    print(json.dumps(run_case(
+        sys.argv[1], sys.argv[2], ndjson=sys.argv[2].endswith('.jsonl'))))
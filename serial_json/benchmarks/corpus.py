@@ -0,0 +1,145 @@
+'''Deterministic synthetic json corpora, written in a streaming fashion so
+that sizes up to gigabytes can be generated in constant memory. '''
+
+from __future__ import print_function, unicode_literals
+
+import io
+import itertools
+import json
+import os
+import random
+import tempfile
+
+MB = 2 ** 20
+
+_ALPHABET = 'ABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghijklmnopqrstuvwxyz0123456789+/'
+
+
+def _wide(rand):
+    '''An object with many keys. '''
+    return dict(('field_{}'.format(i), rand.choice(
+        [rand.randint(0, 1000), 'v{}'.format(i), None, True, 1.5 * i]))
+                for i in range(500))
+
+
+def _deep(rand, depth=64):
+    '''Objects and arrays nested `depth` levels deep. '''
+    value = rand.randint(0, 100)
+    for level in range(depth):
+        if level % 2:
+            value = {'level': level, 'child': value}
+        else:
+            value = [value, level]
+    return value
+
+
+def _numbers(rand):
+    '''An array of integers and floats. '''
+    return [rand.randint(-10 ** 9, 10 ** 9) for _ in range(32)] + [
+        rand.uniform(-1e6, 1e6) for _ in range(32)]
+
+
+def _strings(rand):
+    '''A record of short plain strings. '''
+    return {
+        'name': ''.join(rand.choice(_ALPHABET) for _ in range(
+            rand.randint(5, 30))),
+        'email': 'user{}@example.com'.format(rand.randint(0, 10 ** 6)),
+        'city': rand.choice(['Paris', 'Lagos', 'Lima', 'Osaka', 'Perth']),
+        'text': ' '.join(rand.choice(['lorem', 'ipsum', 'dolor', 'sit'])
+                         for _ in range(rand.randint(5, 40))),
+    }
+
+
+def _escapes(rand):
+    '''Strings dense with escape sequences and non-ASCII characters. '''
+    pieces = ['"quoted"', '\\', '\n', '\t', '\u00e9', '\u4e2d',
+              '\U0001d11e', '\x01', 'plain']
+    return {'text': ''.join(rand.choice(pieces) for _ in range(40)),
+            'path': 'C:\\dir\\{}'.format(rand.randint(0, 1000))}
+
+
+def _ndjson(rand):
+    '''A JSON Lines event record. '''
+    return {'ts': 1500000000 + rand.randint(0, 10 ** 8),
+            'user': rand.randint(0, 10 ** 5),
+            'event': rand.choice(['view', 'click', 'buy']),
+            'tags': [rand.choice(_ALPHABET) for _ in range(3)],
+            'value': round(rand.random() * 100, 3)}
+
+
+# the rows of each corpus, which are the elements of a top level array
+# (except for huge_string and ndjson)
+ROWS = {
+    'wide': _wide,
+    'deep': _deep,
+    'numbers': _numbers,
+    'strings': _strings,
+    'escapes': _escapes,
+    'ndjson': _ndjson,
+}
+CORPORA = sorted(list(ROWS) + ['huge_string'])
+
+
+def generate(kind, size, fp, seed=0):
+    '''Writes a corpus of at least `size` bytes of utf-8 json to a binary
+    file object. Returns the number of bytes written. '''
+    rand = random.Random('{}-{}'.format(kind, seed))
+    if kind == 'huge_string':
+        # a single base64-like string, with an escape every kilobyte
+        block = json.dumps(''.join(
+            rand.choice(_ALPHABET) for _ in range(1023)) + '\n')[1:-1]
+        pieces = _repeat(block.encode('utf-8'), size)
+        start, end = b'{"blob": "', b'"}'
+    elif kind in ROWS:
+        row = ROWS[kind]
+        pieces = (json.dumps(row(rand), ensure_ascii=False).encode('utf-8')
+                  for _ in itertools.count())
+        if kind == 'ndjson':
+            start, separator, end = b'', b'\n', b'\n'
+        else:
+            start, separator, end = b'[', b', ', b']'
+        pieces = _join(pieces, separator)
+    else:
+        raise ValueError('Unknown corpus: {}'.format(kind))
+    fp.write(start)
+    written = len(start)
+    for piece in pieces:
+        fp.write(piece)
+        written += len(piece)
+        if written >= size:
+            break
+    fp.write(end)
+    return written + len(end)
+
+
+def _repeat(piece, size):
+    '''Yields `piece` enough times to reach `size` bytes. '''
+    for _ in range(size // len(piece) + 1):
+        yield piece
+
+
+def _join(pieces, separator):
+    '''Yields pieces, each but the first preceded by `separator`. '''
+    first = True
+    for piece in pieces:
+        yield piece if first else separator + piece
+        first = False
+
+
+def corpus_path(kind, size_mb, directory=None):
+    '''Returns the name of a corpus file of `size_mb` megabytes, generating
+    it in `directory` (by default a temporary directory that persists
+    between runs) unless it already exists. '''
+    if directory is None:
+        directory = os.path.join(tempfile.gettempdir(), 'serial_json_corpora')
+    if not os.path.isdir(directory):
+        os.makedirs(directory)
+    filename = os.path.join(directory, '{}-{:g}mb.{}'.format(
+        kind, size_mb, 'jsonl' if kind == 'ndjson' else 'json'))
+    if not os.path.exists(filename):
+        partial = filename + '.partial'
+        with io.open(partial, 'wb') as fp:
+            generate(kind, int(size_mb * MB), fp)
+        os.rename(partial, filename)
+    return filename
@@ -0,0 +1,184 @@
+'''Measures the peak memory allocated while parsing generated documents of
+increasing length, depth, width or string length, with `tracemalloc`, and
+reports the lines of the parser holding the most memory at the peak, e.g.
+
+    python -m serial_json.benchmarks.memory --shape depth --sizes 100 1000
+'''
+
+from __future__ import print_function, unicode_literals
+
+import argparse
+import linecache
+import os
+import sys
+
+try:
+    import tracemalloc
+except ImportError:
+    tracemalloc = None
+
+import serial_json
+
+SHAPES = ('length', 'depth', 'width', 'string')
+
+# the modules whose allocations are attributed to the parser
+_PARSER_FILES = [
+    os.path.join(os.path.dirname(serial_json.__file__), name)
+    for name in ('serial_json.py', 'jsonpath.py', 'structure.py')]
+
+
+def _pieces(shape, size):
+    '''Yields the text of a document, of `size` records, levels of nesting,
+    keys or string characters, in small pieces. '''
+    if shape == 'length':
+        yield '['
+        for i in range(size):
+            yield ('{}{{"id": {}, "name": "n{}", "values": [1, 2.5, null]}}'
+                   .format(', ' if i else '', i, i))
+        yield ']'
+    elif shape == 'depth':
+        for i in range(size // 2):
+            yield '{{"level{}": ['.format(i)
+        yield '1'
+        for _ in range(size // 2):
+            yield ']}'
+    elif shape == 'width':
+        yield '{'
+        for i in range(size):
+            yield '{}"key{}": {}'.format(', ' if i else '', i, i)
+        yield '}'
+    elif shape == 'string':
+        yield '["'
+        for start in range(0, size, 4096):
+            yield 'x' * min(4096, size - start)
+        yield '"]'
+    else:
+        raise ValueError('Unknown shape: {}'.format(shape))
+
+
+class GeneratedStream(object):
+    '''A text file-like object reading a document as it is generated, so
+    that the document itself never has to be held in memory. '''
+    def __init__(self, shape, size, on_read=None):
+        self._pieces = _pieces(shape, size)
+        self._pending = ''
+        self._on_read = on_read
+
+    def read(self, size=-1):
+        '''Returns up to `size` characters. '''
+        if self._on_read is not None:
+            self._on_read()
+        data = [self._pending]
+        length = len(self._pending)
+        for piece in self._pieces:
+            data.append(piece)
+            length += len(piece)
+            if length >= size >= 0:
+                break
+        data = ''.join(data)
+        if size < 0:
+            size = len(data)
+        self._pending = data[size:]
+        return data[:size]
+
+    def seek(self, *args):
+        '''Generated documents can only be read from the start. '''
+        pass
+
+
+def measure(shape, size, top=5, **kwargs):
+    '''Parses a generated document, discarding its events, and returns a
+    dict with the `peak` bytes allocated and the `top` parser lines by the
+    memory they held at (about) the peak, as `(size, location, source)`
+    tuples. Other keyword arguments are passed to the `Parser`; memory is
+    sampled at each read, of `buffer_size` characters (4096 by default).
+    '''
+    if tracemalloc is None:
+        raise ValueError('Memory measurement requires tracemalloc')
+    kwargs.setdefault('buffer_size', 4096)
+    sample = {'snapshot': None, 'size': 0}
+
+    def on_read():
+        current = tracemalloc.get_traced_memory()[0]
+        if current > sample['size'] * 1.25:
+            # snapshots are costly, so only take them as memory grows
+            sample['snapshot'] = tracemalloc.take_snapshot()
+            sample['size'] = current
+
+    was_tracing = tracemalloc.is_tracing()
+    if was_tracing:
+        tracemalloc.stop()
+    tracemalloc.start()
+    try:
+        parser = serial_json.Parser(
+            GeneratedStream(shape, size, on_read), **kwargs)
+        events = 0
+        batch = []
+        while parser.next_batch(parser.batch_size, batch):
+            events += len(batch)
+        peak = tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+        if was_tracing:
+            tracemalloc.start()
+    snapshot = sample['snapshot']
+    return {
+        'shape': shape,
+        'size': size,
+        'events': events,
+        'peak': peak,
+        'top': _top_lines(snapshot, top) if snapshot is not None else [],
+    }
+
+
+def _top_lines(snapshot, count):
+    '''Returns the parser lines allocating the most memory in a snapshot. '''
+    snapshot = snapshot.filter_traces([
+        tracemalloc.Filter(True, filename) for filename in _PARSER_FILES])
+    lines = []
+    for statistic in snapshot.statistics('lineno')[:count]:
+        frame = statistic.traceback[0]
+        lines.append((
+            statistic.size,
+            '{}:{}'.format(os.path.basename(frame.filename), frame.lineno),
+            linecache.getline(frame.filename, frame.lineno).strip()))
+    return lines
+
+
+def growth(shape, sizes, **kwargs):
+    '''Measures each size of a shape, returning the measurements. '''
+    return [measure(shape, size, **kwargs) for size in sizes]
+
+
+def main(argv=None):
+    '''Command line entry point. Returns the exit status. '''
+    parser = argparse.ArgumentParser(
+        prog='python -m serial_json.benchmarks.memory', description=__doc__)
+    parser.add_argument('--shape', nargs='+', choices=SHAPES,
+                        default=list(SHAPES))
+    parser.add_argument('--sizes', nargs='+', type=int,
+                        default=[1000, 10000, 100000])
+    parser.add_argument('--top', type=int, default=5,
+                        help='Parser lines to report for the largest size')
+    parser.add_argument('--list_paths', action='store_true')
+    parser.add_argument('--lazy_paths', action='store_true')
+    parser.add_argument('--terminators', action='store_true')
+    parser.add_argument('--max_string', type=int)
+    args = parser.parse_args(argv)
+    kwargs = dict(list_paths=args.list_paths, lazy_paths=args.lazy_paths,
+                  terminators=args.terminators, max_string=args.max_string)
+    for shape in args.shape:
+        results = growth(shape, args.sizes, top=args.top, **kwargs)
+        first = results[0]['peak']
+        for result in results:
+            print('{:>7} {:>9}: peak {:>11,} bytes ({:.2f}x)'.format(
+                shape, result['size'], result['peak'],
+                result['peak'] / float(first)))
+        for size, location, source in results[-1]['top']:
+            print('    {:>11,} bytes  {:<20} {}'.format(
+                size, location, source))
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
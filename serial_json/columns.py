@@ -0,0 +1,153 @@
+'''Columnar projection of the rows of a json document. '''
+
+from __future__ import print_function, unicode_literals
+
+from array import array
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+from .jsonpath import STRING_TYPES, parse_parts
+from .serial_json import Parser
+
+_FLOAT_TYPECODES = 'fd'
+_INTEGER_TYPECODES = 'bBhHiIlLqQ'
+
+_MISSING = object()
+_NAN = float('nan')
+
+
+class MaskedArray(array):
+    '''An `array.array` of integers whose `mask` (an `array('B')`) is 1 where
+    a value is missing or null, and the value 0. Integer columns are returned
+    as these when numpy is not installed. '''
+    mask = None
+
+
+def _field_parts(path):
+    '''Returns the parts of a field path relative to the row: a concrete
+    jsonpath whose '$' is the row, or a single key. Rows are whole values,
+    so negative indices may be used. '''
+    if not path.startswith('$'):
+        return (path,)
+    return parse_parts(path, negative=True)[1:]
+
+
+class _Column(object):
+    '''The values of one field in a batch. '''
+    def __init__(self, name, path, typecode, strict=False):
+        if typecode is not None and typecode not in (
+                _FLOAT_TYPECODES + _INTEGER_TYPECODES):
+            raise ValueError('Unsupported typecode {!r} for {}'.format(
+                typecode, name))
+        self.name = name
+        self.parts = _field_parts(path)
+        self.typecode = typecode
+        self._integer = typecode is not None and typecode in _INTEGER_TYPECODES
+        self._strict = strict
+        self.values = None
+
+    def start(self):
+        '''Starts a new batch. '''
+        if self._integer:
+            self.values = MaskedArray(self.typecode)
+            self.values.mask = array('B')
+        else:
+            self.values = [] if self.typecode is None else array(self.typecode)
+
+    def append(self, row):
+        '''Appends the value of the field in `row`, or a null. '''
+        value = row
+        for part in self.parts:
+            if part.__class__ is int:
+                if not isinstance(value, list) or not (
+                        -len(value) <= part < len(value)):
+                    value = _MISSING
+                    break
+            elif not isinstance(value, dict) or part not in value:
+                value = _MISSING
+                break
+            value = value[part]
+        if self.typecode is None:
+            self.values.append(None if value is _MISSING else value)
+            return
+        missing = value is _MISSING or value is None
+        if missing:
+            if not self._integer:
+                value = _NAN
+            elif self._strict:
+                raise ValueError('Missing value for integer column {}'.format(
+                    self.name))
+            else:
+                value = 0
+        elif self._integer and value.__class__ is float and (
+                value.is_integer()):
+            # as parsed by the default number_mode
+            value = int(value)
+        try:
+            self.values.append(value)
+        except (TypeError, OverflowError):
+            raise ValueError('Invalid value {!r} for {} column {}'.format(
+                value, self.typecode, self.name))
+        if self._integer:
+            self.values.mask.append(missing)
+
+    def finish(self):
+        '''Returns the column of the batch. '''
+        values, self.values = self.values, None
+        if numpy is not None and self.typecode is not None:
+            if self._integer:
+                return numpy.ma.MaskedArray(
+                    numpy.frombuffer(values, dtype=values.typecode),
+                    mask=numpy.frombuffer(values.mask, dtype=bool))
+            return numpy.frombuffer(values, dtype=values.typecode)
+        return values
+
+
+def columns(json_file, row, fields, batch_rows=4096, strict=False,
+            **kwargs):
+    '''Yields the values of `fields` in each row found at the jsonpath `row`
+    (e.g. `'$.records[*]'`), as dicts of columns holding up to `batch_rows`
+    rows each.
+
+    `fields` maps (as a dict, or a list of pairs) column names to a path
+    relative to the row (a concrete jsonpath whose '$' is the row, such as
+    `'$.price'` or `'$.geo.region'`, or a single key), or to a `(path,
+    typecode)` pair. Typed columns are numpy arrays if numpy is installed,
+    otherwise `array.array`s of that typecode, and other columns are lists.
+    Missing and null values are None in lists and NaN in float columns. In
+    integer columns they are masked: the columns are numpy masked arrays, or
+    `MaskedArray`s without numpy. With `strict` they raise ValueError instead.
+
+    Rows are built as items, which are decoded with the `json` module when
+    they are at most `hybrid` characters long (64KB by default). Other
+    keyword arguments are passed to the `Parser`. Only one row and one batch
+    are held in memory at a time. '''
+    if batch_rows < 1:
+        raise ValueError('batch_rows must be positive')
+    if hasattr(fields, 'items'):
+        fields = fields.items()
+    projected = []
+    for name, spec in fields:
+        path, typecode = (spec, None) if isinstance(
+            spec, STRING_TYPES) else spec
+        projected.append(_Column(name, path, typecode, strict))
+    kwargs.setdefault('hybrid', 64 * 1024)
+    count = 0
+    for column in projected:
+        column.start()
+    for event in Parser(json_file, paths=row, items=True, **kwargs):
+        # the last of (path, item) or (document, path, item)
+        value = event[-1]
+        for column in projected:
+            column.append(value)
+        count += 1
+        if count == batch_rows:
+            yield dict((column.name, column.finish()) for column in projected)
+            count = 0
+            for column in projected:
+                column.start()
+    if count:
+        yield dict((column.name, column.finish()) for column in projected)
@@ -0,0 +1,85 @@
+'''Parsing of a file that is still being written, following it as `tail -F`
+does. '''
+
+from __future__ import print_function, unicode_literals
+
+import os
+import time
+
+from .serial_json import Parser
+
+
+def follow(path, timeout=None, min_delay=0.01, max_delay=0.25, wait=None,
+           chunk_size=64 * 1024, **kwargs):
+    '''Yields the events of a file as it grows, by default as
+    `(document, path, value)` events of newline delimited json documents.
+
+    The parser keeps its state at the end of the file, and more data is
+    polled for after a delay that doubles from `min_delay` up to `max_delay`
+    seconds while the file is idle. Polling sleeps unless `wait` is given: a
+    function `wait(path, delay)`, e.g. backed by inotify, which returns once
+    the file may have changed or after `delay` seconds.
+
+    The file may not exist yet. When it is replaced (rotated), the rest of
+    the old file is parsed before the new one is opened, and when it is
+    truncated it is read again from the start, so rotation and truncation
+    should happen between documents. With a `timeout`, following ends once
+    the file has been idle that many seconds, and ValueError is raised if a
+    document is incomplete. Other keyword arguments are passed to the
+    `Parser`. '''
+    kwargs.setdefault('multi_document', True)
+    parser = Parser(None, **kwargs)
+    fp = None
+    delay = min_delay
+    last = time.time()
+    try:
+        while True:
+            data = fp.read(chunk_size) if fp is not None else None
+            if data:
+                for event in parser.feed(data):
+                    yield event
+                delay = min_delay
+                last = time.time()
+                continue
+            reopened = _reopen(path, fp)
+            if reopened is not fp:
+                if fp is not None:
+                    # data written just before the file was replaced
+                    for data in iter(lambda: fp.read(chunk_size), b''):
+                        for event in parser.feed(data):
+                            yield event
+                    fp.close()
+                fp = reopened
+                delay = min_delay
+                continue
+            if timeout is not None and time.time() - last >= timeout:
+                break
+            if wait is None:
+                time.sleep(delay)
+            else:
+                wait(path, delay)
+            delay = min(delay * 2, max_delay)
+        for event in parser.close():
+            yield event
+    finally:
+        if fp is not None:
+            fp.close()
+
+
+def _reopen(path, fp):
+    '''Returns a new file object if the file at `path` is not the one that
+    `fp` (which may be None) reads, otherwise `fp`, rewound if the file was
+    truncated. '''
+    try:
+        stat = os.stat(path)
+        if fp is None:
+            return open(path, 'rb')
+        current = os.fstat(fp.fileno())
+        if (stat.st_dev, stat.st_ino) != (current.st_dev, current.st_ino):
+            return open(path, 'rb')
+    except (IOError, OSError):
+        # not created yet, or being replaced
+        return fp
+    if stat.st_size < fp.tell():
+        fp.seek(0)
+    return fp
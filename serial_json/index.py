@@ -0,0 +1,182 @@
+'''Byte offset indexes of json files, for random access by path. '''
+
+from __future__ import print_function, unicode_literals
+
+import json
+import re
+
+from .jsonpath import STRING_TYPES, parse_parts
+from .structure import map_file, skip_container, string_pattern
+
+# appended to a file's name to name its index
+INDEX_SUFFIX = '.idx'
+_VERSION = 1
+
+_token_pattern = re.compile(
+    br'[ \t\n\r]*(?:([\[{])|([\]}])|(,)|(:)|(' + string_pattern + br')'
+    br'|([-+.0-9a-zA-Z]+))')
+_OPEN = 1
+_CLOSE = 2
+_COMMA = 3
+_COLON = 4
+_STRING = 5
+
+
+class Index(object):
+    '''The byte ranges of the object members and array elements of a json
+    file, down to `depth` levels. Each entry is a list of
+    `[start, end, parent, part]`, `parent` being the position of the entry of
+    the enclosing collection (or -1 for the root). '''
+    def __init__(self, entries, depth, size):
+        self.entries = entries
+        self.depth = depth
+        self.size = size
+        self._lookup = None
+
+    def __len__(self):
+        return len(self.entries)
+
+    def find(self, path):
+        '''Returns `(start, end, parts)` for the value at `path` (a concrete
+        jsonpath or a sequence of parts), or for its indexed ancestor if it is
+        deeper than the index. Raises KeyError if it is not in the file. '''
+        if isinstance(path, STRING_TYPES):
+            parts = parse_parts(path)
+        else:
+            parts = tuple(path)
+        if len(parts) == 1:
+            return 0, self.size, parts
+        if self._lookup is None:
+            self._lookup = self._build_lookup()
+        parts = parts[:self.depth + 1]
+        try:
+            start, end = self.entries[self._lookup[parts]][:2]
+        except KeyError:
+            raise KeyError(path)
+        return start, end, parts
+
+    def save(self, filename):
+        '''Writes the index to a file. '''
+        with open(filename, 'w') as fp:
+            json.dump({
+                'version': _VERSION,
+                'depth': self.depth,
+                'size': self.size,
+                'entries': self.entries,
+            }, fp, separators=(',', ':'))
+
+    def check(self, size):
+        '''Raises ValueError unless the index was built for a file of `size`
+        bytes, as an index of a file that has since changed is stale. '''
+        if size != self.size:
+            raise ValueError('Stale index: built for {} bytes, but the file '
+                             'has {}'.format(self.size, size))
+
+    @classmethod
+    def load(cls, filename, size=None):
+        '''Reads an index written by `save`, checking that it was built for a
+        file of `size` bytes if given. '''
+        with open(filename) as fp:
+            data = json.load(fp)
+        if data.get('version') != _VERSION:
+            raise ValueError('Unsupported index version in {}'.format(
+                filename))
+        index = cls(data['entries'], data['depth'], data['size'])
+        if size is not None:
+            index.check(size)
+        return index
+
+    def _build_lookup(self):
+        '''Maps the tuple of parts of each entry to its position. '''
+        paths = []
+        lookup = {}
+        for position, (_, _, parent, part) in enumerate(self.entries):
+            path = (paths[parent] if parent >= 0 else ('$',)) + (part,)
+            paths.append(path)
+            lookup[path] = position
+        return lookup
+
+
+def build_index(fp, depth=2, filename=None, encoding='utf-8'):
+    '''Indexes the byte ranges of the object members and array elements of a
+    binary json file object, down to `depth` levels, with a structural scan
+    (which decodes only object keys, and does not fully validate the file).
+    The index is saved to `filename`, by default the file's name followed by
+    `INDEX_SUFFIX`, and returned. '''
+    if depth < 1:
+        raise ValueError('The index depth must be at least 1')
+    data = map_file(fp)
+    try:
+        index = Index(_index_entries(data, depth, encoding), depth, len(data))
+    finally:
+        if not isinstance(data, bytes):
+            data.close()
+    if filename is None and isinstance(getattr(fp, 'name', None), str):
+        filename = fp.name + INDEX_SUFFIX
+    if filename is not None:
+        index.save(filename)
+    return index
+
+
+def _index_entries(data, max_depth, encoding):
+    '''Scans the structure of a json document, returning index entries. '''
+    # pylint: disable=too-many-branches
+    entries = []
+    # open collections, as [is_object, part of the current child, entry]
+    stack = []
+    key_next = False
+    offset = 0
+    while True:
+        match = _token_pattern.match(data, offset)
+        if not match:
+            raise ValueError('Syntax Error at byte {}'.format(offset))
+        kind = match.lastindex
+        start = match.start(kind)
+        offset = match.end()
+        if kind == _CLOSE:
+            if not stack:
+                raise ValueError('Syntax Error at byte {}'.format(start))
+            entry = stack.pop()[2]
+            if entry >= 0:
+                entries[entry][1] = offset
+            key_next = False
+            if not stack:
+                break
+            continue
+        elif kind == _COMMA:
+            if not stack:
+                raise ValueError('Syntax Error at byte {}'.format(start))
+            if stack[-1][0]:
+                key_next = True
+            else:
+                stack[-1][1] += 1
+            continue
+        elif kind == _COLON:
+            continue
+        elif key_next:
+            if kind != _STRING:
+                raise ValueError('Syntax Error at byte {}'.format(start))
+            key = match.group(kind)
+            if b'\\' in key:
+                stack[-1][1] = json.loads(key.decode(encoding))
+            else:
+                stack[-1][1] = key[1:-1].decode(encoding)
+            key_next = False
+            continue
+
+        depth = len(stack)
+        entry = -1
+        if depth:
+            entry = len(entries)
+            entries.append([start, offset, stack[-1][2], stack[-1][1]])
+        if kind == _OPEN:
+            if depth == max_depth:
+                offset = entries[entry][1] = skip_container(data, offset)
+            else:
+                is_object = match.group(kind) == b'{'
+                stack.append([is_object, None if is_object else 0, entry])
+                key_next = is_object
+                continue
+        if not stack:
+            break
+    return entries
@@ -1,9 +1,11 @@
+'''Parses an endless stream: an object that gains a field every second. '''
+
 from __future__ import print_function, unicode_literals
 
 from datetime import datetime
 import time
 
-import sejson
+import serial_json
 
 
 class InfiniteStream(object):
@@ -21,7 +23,8 @@ class InfiniteStream(object):
     def seek(self, *args):
         pass
 
-while True:
-    parser = sejson.load(InfiniteStream())
+
+if __name__ == '__main__':
+    parser = serial_json.load(InfiniteStream())
     for key, value in parser:
         print(key, value)
@@ -0,0 +1,275 @@
+'''JSONPath rendering, and pattern compilation for filtering parser output.
+'''
+
+from __future__ import print_function, unicode_literals
+
+import re
+
+try:
+    STRING_TYPES = (str, unicode)
+except NameError:
+    STRING_TYPES = (str,)
+
+WILDCARD = '*'
+
+key_pattern = re.compile(r'[a-zA-Z][a-zA-Z0-9_]*\Z')
+
+# rendered key segments, keyed by key (indices are cheap to render)
+_segments = {}
+_SEGMENT_CACHE_SIZE = 4096
+
+_step_pattern = re.compile(r'''
+    (\.\.)?                                # recursive descent
+    (?:
+        \.?([a-zA-Z_][a-zA-Z0-9_]*|\*)     # dotted key or wildcard
+        |\[\s*(
+            \*
+            |-?\d+(?:\s*,\s*-?\d+)*
+            |(?:'(?:[^'\\]|\\.)*'|"(?:[^"\\]|\\.)*")
+             (?:\s*,\s*(?:'(?:[^'\\]|\\.)*'|"(?:[^"\\]|\\.)*"))*
+        )\s*\]
+    )''', re.VERBOSE)
+_quoted_pattern = re.compile(r''''((?:[^'\\]|\\.)*)'|"((?:[^"\\]|\\.)*)"''')
+_unescape_pattern = re.compile(r'\\(.)')
+
+
+def render_part(part):
+    '''Returns the jsonpath segment for a key or index: `.key`, `['key']` or
+    `[index]`. Quotes and backslashes in quoted keys are escaped, as `parse`
+    expects. '''
+    if isinstance(part, int):
+        return '[{}]'.format(part)
+    try:
+        return _segments[part]
+    except KeyError:
+        pass
+    if len(_segments) >= _SEGMENT_CACHE_SIZE:
+        _segments.clear()
+    if part is None:
+        segment = "['']"
+    elif key_pattern.match(part):
+        segment = '.' + part
+    else:
+        segment = "['{}']".format(
+            part.replace('\\', '\\\\').replace("'", "\\'"))
+    _segments[part] = segment
+    return segment
+
+
+class Path(object):
+    '''An immutable jsonpath, stored as its last part and a parent `Path`, so
+    sibling and child paths share their prefix. The jsonpath string and the
+    tuple of parts are only built when requested, and are then cached.
+    Paths compare equal to each other and to their jsonpath string. '''
+    __slots__ = ('parent', 'part', '_string', '_parts')
+
+    def __init__(self, parent=None, part='$'):
+        self.parent = parent
+        self.part = part
+        self._string = None if parent is not None else part
+        self._parts = None if parent is not None else (part,)
+
+    @property
+    def parts(self):
+        '''The path as a tuple of parts, starting with '$'. '''
+        if self._parts is None:
+            pending = []
+            node = self
+            while node._parts is None:
+                pending.append(node)
+                node = node.parent
+            parts = node._parts
+            for node in reversed(pending):
+                parts = node._parts = parts + (node.part,)
+        return self._parts
+
+    def __str__(self):
+        if self._string is None:
+            pending = []
+            node = self
+            while node._string is None:
+                pending.append(node)
+                node = node.parent
+            string = node._string
+            for node in reversed(pending):
+                string = node._string = string + render_part(node.part)
+        return self._string
+
+    def __repr__(self):
+        return 'Path({!r})'.format(str(self))
+
+    def __len__(self):
+        return len(self.parts)
+
+    def __iter__(self):
+        return iter(self.parts)
+
+    def __getitem__(self, index):
+        return self.parts[index]
+
+    def __eq__(self, other):
+        if isinstance(other, Path):
+            node = self
+            while node is not other:
+                if node is None or other is None or node.part != other.part:
+                    return False
+                node, other = node.parent, other.parent
+            return True
+        elif isinstance(other, STRING_TYPES):
+            return str(self) == other
+        return NotImplemented
+
+    def __ne__(self, other):
+        result = self.__eq__(other)
+        return result if result is NotImplemented else not result
+
+    def __hash__(self):
+        return hash(str(self))
+
+    def __reduce__(self):
+        return (_unpickle_path, (self.parts,))
+
+
+def _unpickle_path(parts):
+    '''Rebuilds a pickled `Path`. '''
+    path = Path(None, parts[0])
+    for part in parts[1:]:
+        path = Path(path, part)
+    return path
+
+
+def parse(path, negative=False):
+    '''Parses a jsonpath pattern into a list of `(descend, parts)` steps,
+    where `parts` is either `WILDCARD` or a frozenset of keys and indices.
+    Negative indices are rejected unless `negative` is set, as a parser
+    can not know that an element is the last until its array ends. '''
+    if not path.startswith('$'):
+        raise ValueError("Invalid jsonpath '{}': expected '$'".format(path))
+    steps = []
+    offset = 1
+    while offset < len(path):
+        match = _step_pattern.match(path, offset)
+        if not match or match.end() == offset:
+            raise ValueError("Invalid jsonpath '{}' at offset {}".format(
+                path, offset))
+        descend, name, bracket = match.groups()
+        if name is not None and not descend and path[offset] != '.':
+            raise ValueError("Invalid jsonpath '{}' at offset {}".format(
+                path, offset))
+        if name == WILDCARD or bracket == WILDCARD:
+            parts = WILDCARD
+        elif name is not None:
+            parts = frozenset([name])
+        elif bracket[0] in '\'"':
+            parts = frozenset(
+                _unescape_pattern.sub(r'\1', single or double)
+                for single, double in _quoted_pattern.findall(bracket)
+            )
+        else:
+            parts = frozenset(int(i) for i in bracket.split(','))
+            if not negative and min(parts) < 0:
+                raise ValueError(
+                    "Invalid jsonpath '{}': negative index at offset {}"
+                    .format(path, offset))
+        steps.append((bool(descend), parts))
+        offset = match.end()
+    return steps
+
+
+def parse_parts(path, negative=False):
+    '''Parses a concrete jsonpath (no wildcards or recursion) into a tuple of
+    parts, starting with '$'. Negative indices are allowed if `negative` is
+    set. '''
+    parts = ['$']
+    for descend, step in parse(path, negative):
+        if descend or step is WILDCARD or len(step) != 1:
+            raise ValueError("Not a concrete jsonpath: '{}'".format(path))
+        parts.extend(step)
+    return tuple(parts)
+
+
+class Selector(object):
+    '''Matches parser scopes against a set of jsonpath patterns.
+
+    Selection is tracked as a nondeterministic automaton: a state is a
+    frozenset of `(pattern, step)` pairs and is advanced one path part at a
+    time via `step`. An empty state means that nothing beneath the current
+    path can match, a state in which a pattern has consumed all of its steps
+    is accepting (as are all of its descendants). Transitions are memoized so
+    that repeated keys and indices cost a single dictionary lookup.
+    '''
+    def __init__(self, patterns):
+        if isinstance(patterns, STRING_TYPES):
+            patterns = [patterns]
+        # patterns may also be given as lists of steps, as returned by parse
+        self.patterns = [
+            parse(pattern) if isinstance(pattern, STRING_TYPES)
+            else list(pattern) for pattern in patterns]
+        self.root = frozenset(
+            (i, 0) for i in range(len(self.patterns)))
+        self.dead = frozenset()
+        self._transitions = {}
+        self._literals = {}
+        self._accepted = {}
+
+    def step(self, state, part):
+        '''Returns the state reached from `state` by descending into `part`.
+        '''
+        if part is None:
+            return self.dead
+        literals = self._literals.get(state)
+        if literals is None:
+            literals = self._literals[state] = self._find_literals(state)
+        if part not in literals:
+            # unlisted parts only differ by kind, so share one transition
+            key = int if isinstance(part, int) else str
+        else:
+            key = part
+        try:
+            return self._transitions[state, key]
+        except KeyError:
+            result = self._transitions[state, key] = self._step(state, part)
+            return result
+
+    def accepts(self, state):
+        '''Returns true if `state` selects its path (and all descendants). '''
+        try:
+            return bool(self._accepted[state])
+        except KeyError:
+            return bool(self.accepted(state))
+
+    def accepted(self, state):
+        '''Returns the indices of all patterns that `state` accepts. '''
+        try:
+            return self._accepted[state]
+        except KeyError:
+            result = self._accepted[state] = frozenset(
+                pattern for pattern, index in state
+                if index == len(self.patterns[pattern])
+            )
+            return result
+
+    def _find_literals(self, state):
+        '''Collects the explicit parts that may advance `state`. '''
+        literals = set()
+        for pattern, index in state:
+            if index < len(self.patterns[pattern]):
+                parts = self.patterns[pattern][index][1]
+                if parts is not WILDCARD:
+                    literals.update(parts)
+        return frozenset(literals)
+
+    def _step(self, state, part):
+        '''Uncached transition function. '''
+        result = set()
+        for pattern, index in state:
+            steps = self.patterns[pattern]
+            if index == len(steps):
+                result.add((pattern, index))
+                continue
+            descend, parts = steps[index]
+            if descend:
+                result.add((pattern, index))
+            if parts is WILDCARD or part in parts:
+                result.add((pattern, index + 1))
+        return frozenset(result)
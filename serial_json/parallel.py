@@ -0,0 +1,154 @@
+'''Parallel parsing of newline delimited json documents (JSON Lines), and of
+a single top level array. '''
+
+from __future__ import print_function, unicode_literals
+
+from collections import deque
+import io
+import multiprocessing
+import os
+import re
+
+from .serial_json import Parser
+from .structure import (
+    CLOSE, OPEN, element_pattern, map_file, structure_pattern, ws_pattern)
+
+_array_start_pattern = re.compile(br'[ \t\n\r]*\[')
+
+
+def parallel_load(filename, workers=None, chunk_size=4 * 1024 * 1024,
+                  **kwargs):
+    '''Yields `(document, path, value)` events, in order, for a file of
+    newline delimited json documents. The file is split at newlines into byte
+    ranges of about `chunk_size` bytes, which are parsed by a pool of
+    `workers` processes. No document may span lines, and at most two ranges
+    per worker are in flight at a time. Other keyword arguments are passed to
+    each `Parser`, and must be picklable. '''
+    from concurrent.futures import ProcessPoolExecutor
+    workers = workers or multiprocessing.cpu_count()
+    kwargs['multi_document'] = True
+    documents = 0
+    with ProcessPoolExecutor(workers) as executor:
+        calls = ((_parse_range, (filename, start, end, kwargs))
+                 for start, end in _split_lines(filename, chunk_size))
+        for events, count in _in_order(executor, calls, workers):
+            for document, path, value in events:
+                yield document + documents, path, value
+            documents += count
+
+
+def parallel_array(filename, workers=None, chunk_size=4 * 1024 * 1024,
+                   **kwargs):
+    '''Yields the same `(path, value)` events as `load` for a file holding
+    a single top level array (in an ASCII compatible encoding), parsing its
+    elements in parallel. A structural pre-scan, which only tracks brackets
+    and strings, splits the array into ranges of elements of about
+    `chunk_size` bytes, and these are parsed by a pool of `workers`
+    processes. Other keyword arguments are passed to each `Parser`, and must
+    be picklable. Note that `NumberBlock`s end at range boundaries. '''
+    from concurrent.futures import ProcessPoolExecutor
+    workers = workers or multiprocessing.cpu_count()
+    # the root's own events (terminators) come from a parser of '[]'
+    root = Parser(None, **kwargs)
+    if root._items and root._is_accepted():  # pylint: disable=protected-access
+        raise ValueError('parallel_array cannot build the root as an item')
+    for event in root.feed('['):
+        yield event
+    with ProcessPoolExecutor(workers) as executor:
+        calls = ((_parse_array_range, (filename, start, end, index, kwargs))
+                 for start, end, index in _split_array(filename, chunk_size))
+        for events in _in_order(executor, calls, workers):
+            for event in events:
+                yield event
+    for event in root.feed(']') + root.close():
+        yield event
+
+
+def _in_order(executor, calls, workers):
+    '''Submits `(function, args)` calls to `executor`, yielding their results
+    in order with at most two calls per worker outstanding. '''
+    pending = deque()
+    for function, args in calls:
+        pending.append(executor.submit(function, *args))
+        if len(pending) >= 2 * workers:
+            yield pending.popleft().result()
+    while pending:
+        yield pending.popleft().result()
+
+
+def _split_lines(filename, chunk_size):
+    '''Yields `(start, end)` byte ranges of the file, ending at newlines. '''
+    with open(filename, 'rb') as fp:
+        size = os.fstat(fp.fileno()).st_size
+        start = 0
+        while start < size:
+            fp.seek(start + chunk_size)
+            fp.readline()
+            end = min(fp.tell(), size)
+            yield start, end
+            start = end
+
+
+def _split_array(filename, chunk_size):
+    '''Yields `(start, end, index)` byte ranges of the elements of a top level
+    array, separated by commas, where `index` is the array index of the
+    first element in the range. '''
+    with open(filename, 'rb') as fp:
+        data = map_file(fp)
+    try:
+        match = _array_start_pattern.match(data)
+        if not match:
+            raise ValueError('Syntax Error: Expected a top level array')
+        start = offset = match.end()
+        index = count = 0
+        depth = 1
+        while depth:
+            if depth == 1:
+                match = element_pattern.match(data, offset)
+            else:
+                match = structure_pattern.match(data, offset)
+            if not match:
+                raise ValueError('Unexpected end of file')
+            offset = match.end()
+            kind = match.lastindex
+            if kind == OPEN:
+                depth += 1
+            elif kind == CLOSE:
+                depth -= 1
+            else:
+                count += 1
+                if offset - start > chunk_size:
+                    yield start, offset - 1, index
+                    start, index = offset, count
+        end = offset - 1
+        if ws_pattern.match(data, offset).end() != len(data):
+            raise ValueError('Syntax Error: Data after the top level array')
+        if count or ws_pattern.match(data, start).end() != end:
+            yield start, end, index
+    finally:
+        if not isinstance(data, bytes):
+            data.close()
+
+
+def _read_range(filename, start, end):
+    '''Returns a byte range of the file. '''
+    with open(filename, 'rb') as fp:
+        fp.seek(start)
+        return fp.read(end - start)
+
+
+def _parse_range(filename, start, end, kwargs):
+    '''Parses a byte range in a worker, returning its events and the number
+    of documents in it. '''
+    parser = Parser(io.BytesIO(_read_range(filename, start, end)), **kwargs)
+    events = list(parser)
+    return events, parser._document + 1  # pylint: disable=protected-access
+
+
+def _parse_array_range(filename, start, end, index, kwargs):
+    '''Parses a range of top level array elements in a worker, returning its
+    events. '''
+    # pylint: disable=protected-access
+    parser = Parser(io.BytesIO(_read_range(filename, start, end)), **kwargs)
+    parser._restore_scope(['$', index], [Parser._NONE, Parser._LIST])
+    return list(parser)
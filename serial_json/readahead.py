@@ -0,0 +1,297 @@
+'''Background reading of binary input, with transparent decompression of
+gzip, bz2 and xz files. '''
+
+from __future__ import print_function, unicode_literals
+
+import bz2
+import threading
+import zlib
+
+try:
+    import queue
+except ImportError:
+    import Queue as queue
+
+try:
+    import lzma
+except ImportError:
+    lzma = None
+
+# the magic bytes that start each compression format
+MAGIC = (
+    (b'\x1f\x8b', 'gzip'),
+    (b'BZh', 'bz2'),
+    (b'\xfd7zXZ\x00', 'xz'),
+)
+_MAGIC_SIZE = max(len(magic) for magic, _ in MAGIC)
+
+
+def detect_compression(fp):
+    '''Returns the compression format ('gzip', 'bz2' or 'xz') of a binary
+    file object from its magic bytes, or None, without moving its position.
+    '''
+    if hasattr(fp, 'peek'):
+        head = fp.peek(_MAGIC_SIZE)[:_MAGIC_SIZE]
+    else:
+        position = fp.tell()
+        head = fp.read(_MAGIC_SIZE)
+        fp.seek(position, 0)
+    if not isinstance(head, bytes):
+        return None
+    for magic, compression in MAGIC:
+        if head.startswith(magic):
+            return compression
+    return None
+
+
+def open_input(fp, read_ahead=2, chunk_size=256 * 1024):
+    '''Returns a file-like object reading (and decompressing) the binary file
+    object `fp` in a background thread, up to `read_ahead` chunks ahead of
+    the reader. Each chunk is decompressed from `chunk_size` bytes of input.
+    The compression is detected from the magic bytes. '''
+    return ReadAhead(fp, detect_compression(fp), read_ahead, chunk_size)
+
+
+def _decompressor(compression):
+    '''Returns a new decompressor for one stream of a format. '''
+    if compression == 'gzip':
+        return zlib.decompressobj(16 + zlib.MAX_WBITS)
+    elif compression == 'bz2':
+        return bz2.BZ2Decompressor()
+    if lzma is None:
+        raise ValueError('xz input requires the lzma module')
+    return lzma.LZMADecompressor()
+
+
+def _decompress(decompressor, data, size):
+    '''Decompresses data, into at most `size` bytes where the decompressor
+    takes a limit (all but Python 2's bz2). '''
+    if hasattr(decompressor, 'unconsumed_tail') or hasattr(
+            decompressor, 'needs_input'):
+        return decompressor.decompress(data, size)
+    return decompressor.decompress(data)
+
+
+def _ended(decompressor):
+    '''Whether a decompressor has reached the end of its stream, or None if
+    it can not tell (Python 2's zlib, until it is given data past it). '''
+    eof = getattr(decompressor, 'eof', None)
+    if eof is not None:
+        return eof
+    elif decompressor.unused_data:
+        return True
+    elif hasattr(decompressor, 'unconsumed_tail'):
+        return None
+    # Python 2's bz2 refuses data past the end
+    try:
+        decompressor.decompress(b'')
+    except EOFError:
+        return True
+    return False
+
+
+def _complete(decompressor):
+    '''Whether a decompressor which has been given all of its input reached
+    the end of its stream. '''
+    ended = _ended(decompressor)
+    if ended is None:
+        # Python 2's zlib keeps data past the end as unused
+        try:
+            decompressor.decompress(b'\0')
+        except zlib.error:
+            return False
+        ended = bool(decompressor.unused_data)
+    return ended
+
+
+def _remainder(decompressor, chunk, size):
+    '''Returns the input a decompressor has not consumed, after returning
+    `chunk` of at most `size` bytes, and whether it may hold more output. '''
+    if _ended(decompressor):
+        return decompressor.unused_data, False
+    elif hasattr(decompressor, 'unconsumed_tail'):
+        # zlib
+        return decompressor.unconsumed_tail, len(chunk) == size
+    elif hasattr(decompressor, 'needs_input'):
+        return b'', not decompressor.needs_input
+    return b'', False
+
+
+class ReadAhead(object):
+    '''A read only binary file-like object, whose data is read (and
+    decompressed) from another by a background thread, into a queue of
+    `read_ahead` chunks. Positions are those of the decompressed data;
+    seeking restarts the thread, and skips forward to the position. '''
+    def __init__(self, fp, compression=None, read_ahead=2,
+                 chunk_size=256 * 1024):
+        if read_ahead < 1:
+            raise ValueError('read_ahead must be at least 1')
+        if compression is not None:
+            # fail early on a missing module
+            _decompressor(compression)
+        self.fp = fp
+        self.compression = compression
+        self.read_ahead = read_ahead
+        self.chunk_size = chunk_size
+        self._origin = fp.tell() if hasattr(fp, 'tell') else 0
+        self._queue = None
+        self._thread = None
+        self._stopping = None
+        self._chunk = b''
+        self._offset = 0
+        self._position = 0
+        self._eof = False
+        # whether `stop` discarded the data read ahead
+        self._stopped = False
+
+    def read(self, size=-1):
+        '''Returns up to `size` bytes (or all remaining bytes if negative),
+        which may be fewer than asked for before the end of the data. '''
+        if size is None or size < 0:
+            chunks = []
+            while True:
+                data = self.read(self.chunk_size)
+                if not data:
+                    return b''.join(chunks)
+                chunks.append(data)
+        if self._offset == len(self._chunk):
+            if not self._next_chunk():
+                return b''
+        data = self._chunk[self._offset:self._offset + size]
+        self._offset += len(data)
+        self._position += len(data)
+        return data
+
+    def tell(self):
+        '''Returns the position in the decompressed data. '''
+        return self._position
+
+    def seek(self, offset, whence=0):
+        '''Moves to a position in the decompressed data. Only absolute
+        positions are supported, and all but position 0 are reached by
+        reading up to them. '''
+        if whence != 0 or offset < 0:
+            raise ValueError('Only absolute positions are supported')
+        if offset < self._position or self._stopped:
+            self._stop()
+            self.fp.seek(self._origin, 0)
+            self._chunk = b''
+            self._offset = self._position = 0
+            self._eof = self._stopped = False
+        while self._position < offset:
+            if not self.read(offset - self._position):
+                break
+        return self._position
+
+    def seekable(self):
+        '''Whether `seek` is supported (as it is by the wrapped file). '''
+        return hasattr(self.fp, 'seek')
+
+    def close(self):
+        '''Stops the background thread, and closes the wrapped file. '''
+        self.stop()
+        self.fp.close()
+
+    def stop(self):
+        '''Stops the background thread, leaving the wrapped file open. Data
+        read ahead is discarded, so only `seek` may follow. '''
+        self._stop()
+        self._chunk = b''
+        self._offset = 0
+        self._eof = self._stopped = True
+
+    def __del__(self):
+        # stop the thread of an abandoned reader
+        stopping = getattr(self, '_stopping', None)
+        if stopping is not None:
+            stopping.set()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def _next_chunk(self):
+        '''Takes the next chunk from the queue, starting the thread if
+        needed. Returns false at the end of the data. '''
+        if self._eof:
+            return False
+        if self._thread is None:
+            self._queue = queue.Queue(self.read_ahead)
+            self._stopping = threading.Event()
+            self._thread = threading.Thread(target=_read_chunks, args=(
+                self.fp, self.compression, self.chunk_size, self._queue,
+                self._stopping))
+            self._thread.daemon = True
+            self._thread.start()
+        chunk = self._queue.get()
+        if isinstance(chunk, Exception):
+            self._eof = True
+            self._thread.join()
+            self._thread = None
+            raise chunk
+        if not chunk:
+            self._eof = True
+            self._thread.join()
+            self._thread = None
+            return False
+        self._chunk = chunk
+        self._offset = 0
+        return True
+
+    def _stop(self):
+        '''Stops the background thread, if it is running. '''
+        if self._thread is not None:
+            self._stopping.set()
+            self._thread.join()
+            self._thread = None
+
+
+def _read_chunks(fp, compression, chunk_size, chunks, stopping):
+    '''Reads (and decompresses) chunks of `fp` into the queue `chunks`, until
+    the end of the data or until `stopping` is set. This runs in a thread,
+    which holds no reference to its `ReadAhead`, so that an abandoned one is
+    collected (and stops the thread). '''
+    def put(chunk):
+        while not stopping.is_set():
+            try:
+                chunks.put(chunk, timeout=0.05)
+                return True
+            except queue.Full:
+                pass
+        return False
+
+    try:
+        if compression is None:
+            while True:
+                data = fp.read(chunk_size)
+                if not put(data) or not data:
+                    return
+        decompressor = _decompressor(compression)
+        # input not yet given to the decompressor, and whether it may
+        # hold more output without more input
+        data, more = b'', False
+        while True:
+            if not data and not more:
+                data = fp.read(chunk_size)
+                if not data:
+                    if not _complete(decompressor):
+                        raise ValueError('Truncated {} input'.format(
+                            compression))
+                    put(b'')
+                    return
+            if _ended(decompressor):
+                # concatenated streams
+                decompressor = _decompressor(compression)
+            try:
+                chunk = _decompress(decompressor, data, chunk_size)
+            except Exception as error:  # pylint: disable=broad-except
+                raise ValueError('Invalid {} input: {}'.format(
+                    compression, error))
+            data, more = _remainder(decompressor, chunk, chunk_size)
+            if chunk and not put(chunk):
+                return
+    except Exception as error:  # pylint: disable=broad-except
+        # raised by the reader instead
+        put(error)
@@ -2,20 +2,79 @@
 
 from __future__ import print_function, unicode_literals
 
+from array import array
+import codecs
+from collections import deque
+import copy
+from decimal import Decimal
+import io
+import itertools
+import json
+import os
 import re
-import sys
+import time
+
+from .index import INDEX_SUFFIX, Index
+from .jsonpath import (
+    STRING_TYPES, Path, Selector, parse_parts, render_part, _segments)
+from .readahead import ReadAhead, detect_compression, open_input
+from .structure import map_file
 
 try:
     CHR = unichr
 except NameError:
     CHR = chr
 
+try:
+    # Python 2's re scans old style buffers, not memoryviews
+    _BUFFER = buffer
+except NameError:
+    _BUFFER = None
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+TEXT = type('')
+
+# Converters for integers and for other numbers, by number_mode.
+NUMBER_MODES = {
+    'float': (float, float),
+    'int_or_float': (int, float),
+    'decimal': (Decimal, Decimal),
+    'raw': (TEXT, TEXT),
+}
+
+# returned by Parser._build while an item is still being constructed (and by
+# Parser._parse_string once a chunked string has been yielded)
+_PENDING = object()
+# returned by Parser._parse_string after yielding part of a chunked string, or
+# when a push parser runs out of data mid-string
+_PARTIAL = object()
+
+def _reject_constant(name):
+    '''Rejects the NaN and Infinity literals that `json` accepts. '''
+    raise ValueError('Invalid constant: {}'.format(name))
+
 # pylint: disable=too-few-public-methods
 class Token(object):
-    '''Base token class, used for Terminators and possibly more. '''
+    '''Base token class, used for Terminators and possibly more. Tokens of
+    the same class compare equal. '''
     def __str__(self):
         return '<{}>'.format(self.__class__.__name__)
 
+    __repr__ = __str__
+
+    def __eq__(self, other):
+        return self.__class__ is other.__class__
+
+    def __ne__(self, other):
+        return not self == other
+
+    def __hash__(self):
+        return hash(self.__class__)
+
 class Terminator(Token):
     '''Signifies the beginning or end of a collection. '''
     pass
@@ -52,16 +111,121 @@ class EndArray(EndTerminator, ArrayTerminator):
     '''Signifies the end of an array. '''
     pass
 
+# codecs.lookup() names of the encodings a mapped file may be scanned in
+_ASCII_COMPATIBLE = ('utf-8', 'ascii', 'latin-1', 'iso8859-1')
+
+# Token kinds, as numbered by the groups of Parser.token_pattern (the match's
+# lastindex). Numbers end on the group of their last component.
+_OBJECT_START = 1
+_OBJECT_END = 2
+_ARRAY_START = 3
+_ARRAY_END = 4
+_COMMA = 5
+_COLON_TOKEN = 6
+_STRING = 7         # a complete string without escapes
+_STRING_START = 8   # the opening quote of any other string
+_NUMBER = 9         # an integer
+_FRACTION = 10      # a number with a fraction
+_EXPONENT = 11      # a number with an exponent
+_TRUE = 12
+_FALSE = 13
+_NULL = 14
+
+# The longest unmatchable remainder that may yet become a token ('fals').
+_MAX_PARTIAL = 5
+# The longest escape sequence (a surrogate pair, '\\ud834\\udd1e').
+_MAX_ESCAPE = 12
+
+# Scanner states: the token(s) expected next.
+_VALUE = 0          # a value (or the end of the file at the top level)
+_VALUE_OR_END = 1   # a value or ']'
+_NEXT = 2           # ',' or the end of the collection
+_COLON = 3
+_KEY = 4
+_KEY_OR_END = 5     # a key or '}'
+_IN_STRING = 6      # the remainder of a string value
+_IN_KEY = 7         # the remainder of an object key
+_IN_SKIP = 8        # the remainder of a skipped value
+
+class StringChunk(Token):
+    '''A piece of a string value longer than the parser's `max_string`. '''
+    def __init__(self, value):
+        self.value = value
+
+    def __str__(self):
+        return '<{} {!r}>'.format(self.__class__.__name__, self.value)
+
+    __repr__ = __str__
+
+    def __eq__(self, other):
+        return (self.__class__ is other.__class__ and
+                self.value == other.value)
+
+    def __hash__(self):
+        return hash(self.value)
+
+class StringEnd(Token):
+    '''Signifies the end of a string yielded as `StringChunk`s. '''
+    pass
+
+class NumberBlock(Token):
+    '''A run of numbers from an array, starting at index `start`. `values`
+    is a numpy array of floats if numpy is installed, otherwise an
+    `array.array('d')`. '''
+    def __init__(self, start, values):
+        self.start = start
+        self.values = values
+
+    def __len__(self):
+        return len(self.values)
+
+    def __str__(self):
+        return '<{} [{}] {!r}>'.format(
+            self.__class__.__name__, self.start, list(self.values))
+
+    __repr__ = __str__
+
+    def __eq__(self, other):
+        return (self.__class__ is other.__class__ and
+                self.start == other.start and
+                list(self.values) == list(other.values))
+
+    def __hash__(self):
+        return hash((self.start, len(self.values)))
+
 class Parser(object):
     '''Serial Parser for json files. '''
-    digits = '-0123456789.'
-    digits_terminator = '\t\n\r\f ,]}'
-    key_pattern = re.compile(
-        r'^[a-zA-Z][a-zA-Z0-9_]*$'
-    )
+    token_pattern = re.compile(r'''[ \t\n\r]*(?:
+        (\{)|(\})|(\[)|(\])|(,)|(:)
+        |"([^"\\]*)"|(")
+        |(-?[0-9]+)(\.[0-9]+)?([eE][-+]?[0-9]+)?
+        |(true)|(false)|(null))''', re.VERBOSE)
+    ws_pattern = re.compile(r'[ \t\n\r]*')
+    # the end of a buffer, after a number, which may continue the number
+    number_tail_pattern = re.compile(r'[0-9.eE+-]*\Z')
+    # the unescaped part of a string, and its closing quote
+    string_pattern = re.compile(r'[^"\\]*(")?')
+    # a utf-8 continuation byte
+    continuation_pattern = re.compile(br'[\x80-\xbf]')
+    escape_pattern = re.compile(r'''\\(?:
+        u([dD][89abAB][0-9a-fA-F]{2})\\u([dD][c-fC-F][0-9a-fA-F]{2})
+        |u([0-9a-fA-F]{4})
+        |(.))''', re.VERBOSE | re.DOTALL)
 
-    ws_pattern = re.compile(r'[ \t\n\r]*([^ \t\n\r])', re.MULTILINE)
-    str_pattern = re.compile(r'([^"]*)"', re.MULTILINE)
+    # a run of up to {} comma separated numbers, used for number_blocks
+    number_run_format = (
+        r'-?[0-9]+(?:\.[0-9]+)?(?:[eE][-+]?[0-9]+)?'
+        r'(?:[ \t\n\r]*,[ \t\n\r]*-?[0-9]+(?:\.[0-9]+)?(?:[eE][-+]?[0-9]+)?)'
+        r'{{0,{}}}')
+
+    # raw scanning patterns, used to skip unselected values
+    skip_string_pattern = re.compile(r'[^"\\]*(?:\\.[^"\\]*)*(")?', re.DOTALL)
+    skip_collection_pattern = re.compile(r'(")|([\[{])|([\]}])')
+    # the patterns used on text, which are compiled for bytes to scan mapped
+    # files in place
+    text_patterns = ('token_pattern', 'ws_pattern', 'number_tail_pattern',
+                     'string_pattern', 'escape_pattern',
+                     'skip_string_pattern', 'skip_collection_pattern')
 
     # parser mode contstants
     _NONE = 0
@@ -72,6 +236,7 @@ class Parser(object):
         '"': '"',
         "'": "'",
         '\\': '\\',
+        '/': '/',
         'b': '\b',
         'f': '\f',
         'n': '\n',
@@ -80,51 +245,166 @@ class Parser(object):
     }
 
     def __init__(self, file_object, terminators=False, rewind=True,
-                 list_paths=False, encoding='utf-8', **kwargs):
+                 list_paths=False, encoding='utf-8', paths=None, items=False,
+                 max_string=None, lazy_paths=False, number_mode='float',
+                 number_blocks=None, multi_document=False, mmap=False,
+                 read_ahead=None, hybrid=None, stats=False, progress=None,
+                 **kwargs):
         '''Constructor. 
-        :param file_object: A file-like object to read.
+        :param file_object: A file-like object to read, or None to give the
+                            data to `feed` instead.
         :param terminators: If true, yields terminators on beginning and end
                             of collections.
         :param rewind: Whether to seek the file-like object to 0 on load.
         :param list_paths: Yield paths as a list datatype rather than a
                            jsonpath.
         :param encoding: Encoding of the file object.
+        :param paths: A jsonpath pattern or list of patterns. If given, only
+                      values at (or beneath) a matching path are yielded and
+                      all other subtrees are skipped without being decoded.
+        :param items: Yield each value matched by `paths` whole (as a dict,
+                      list or scalar) rather than as a stream of leaves.
+        :param max_string: Yield string values longer than this as a series of
+                           `StringChunk`s of this length, followed by a
+                           `StringEnd`, instead of as a whole. Object keys
+                           and items are not chunked.
+        :param lazy_paths: Yield paths as `Path` objects, which are only
+                           rendered to a jsonpath string (or a tuple of parts)
+                           when used.
+        :param number_mode: How numbers are converted: 'float' (all numbers),
+                            'int_or_float' (integers become ints, as with
+                            `json`), 'decimal' or 'raw' (the number's text).
+        :param number_blocks: Yield runs of numbers within an array as
+                              `NumberBlock`s of up to this many floats, with
+                              the array's path, rather than one event per
+                              number. Requires the 'float' number_mode, and
+                              is ignored for items and partly selected arrays.
+        :param multi_document: Yield `(document, path, value)` events for a
+                               file of concatenated documents (such as JSON
+                               Lines), where `document` counts the top level
+                               values from 0.
+        :param mmap: Map the (binary) file into memory and scan it in place,
+                     decoding only the keys and values returned. Requires an
+                     ASCII compatible encoding, such as utf-8.
+        :param read_ahead: Read the (binary) file in a background thread, up
+                           to this many buffers ahead of parsing. gzip, bz2
+                           and xz files are detected from their magic bytes,
+                           and decompressed by the thread. Positions are
+                           those of the decompressed data.
+        :param hybrid: Decode objects and arrays of up to this many characters
+                       (or bytes) with the `json` module's C decoder, where
+                       they end within the buffer, rather than scanning them.
+                       Their events are the same. Ignored with
+                       number_blocks.
+        :param stats: Count events by type, and the length of the largest
+                      string, for `stats` (which otherwise reports only
+                      counters kept at no per-event cost).
+        :param progress: A function called with `stats()` every
+                         `progress_interval` seconds (1 by default) while
+                         parsing, and once at the end.
+
+        Binary file objects are decoded incrementally using `encoding`, and
+        are read into a reusable buffer where `readinto` is supported. The
+        `buffer_size` keyword sets the read size (in bytes or characters), and
+        `batch_size` the number of events parsed ahead when iterating.
         '''
         self.start_object = StartObject()
         self.end_object = EndObject()
         self.start_array = StartArray()
         self.end_array = EndArray()
+        self.string_end = StringEnd()
 
         self.terminators = terminators
 
+        self.buffer_size = kwargs.pop('buffer_size', 64 * 1024)
+        if read_ahead and not mmap and file_object is not None:
+            file_object = open_input(
+                file_object, read_ahead, self.buffer_size)
         self.reader = file_object
-        self.buffer_size = kwargs.pop('buffer_size', 1024)
+        # the file object opened for the parser, closed by release()
+        self._owned_file = None
+        # chunks given to feed() but not yet read, for push parsers
+        self._pending = deque() if file_object is None else None
+        self.batch_size = kwargs.pop('batch_size', 4096)
+        self._progress = progress
+        self._progress_interval = kwargs.pop('progress_interval', 1.0)
         if kwargs:
             raise ValueError("Unrecognized arguments: '{}'".format(
                 "', '".join(kwargs.keys())
             ))
         self._list_paths = list_paths
+        self._lazy_paths = lazy_paths
+        if number_mode not in NUMBER_MODES:
+            raise ValueError("Unrecognized number_mode: '{}'".format(
+                number_mode))
+        self._number_mode = number_mode
+        self._number_converters = NUMBER_MODES[number_mode]
         self._encoding = encoding
+        self._map = None
+        self._decode = None
+        if mmap:
+            if codecs.lookup(encoding).name not in _ASCII_COMPATIBLE:
+                raise ValueError(
+                    "Can not scan '{}' encoded files in place".format(
+                        encoding))
+            self._map = map_file(file_object)
+            self._use_bytes()
+        self._multi_document = multi_document
+        # (len(out), document) at the start of each document in a batch
+        self._document_marks = []
+        self._number_run = None
+        if number_blocks and not items:
+            if number_mode != 'float':
+                raise ValueError("number_blocks requires number_mode 'float'")
+            number_run = self.number_run_format.format(number_blocks - 1)
+            if self._map is not None:
+                number_run = number_run.encode('ascii')
+            self._number_run = re.compile(number_run).match
+        self._count_events = stats or progress is not None
+        self._hybrid = None
+        if hybrid and self._number_run is None:
+            self._hybrid = hybrid
+            parse_int, parse_float = NUMBER_MODES[number_mode]
+            # objects are decoded as tuples of pairs, to keep duplicate keys,
+            # unless building items
+            self._raw_decode = json.JSONDecoder(
+                parse_int=parse_int, parse_float=parse_float,
+                parse_constant=_reject_constant,
+                object_pairs_hook=None if items else tuple).raw_decode
+        if lazy_paths:
+            self._build_path = Path
+        elif list_paths:
+            self._build_path = self._build_list_path
+        self._decoder = None
+        self._read_view = None
+        self._paths_selector = Selector(paths) if paths is not None else None
+        self._selector = self._paths_selector
+        self._index = None
+        self._items = items
+        self._max_string = None if items else max_string
 
-        self._is_python2 = sys.version_info[0] < 3
         self._iter = None
 
         # parser variables
         self.buffer = ''
         self.buffer_offset = 0
-        self._path = '$'
-        if self._list_paths:
-            self._path = ['$']
+        self._path = self._root_path()
         self._part = '$'
         self._mode = 0
         self._parts = ['$']
         self._paths = [self._path]
         self._modes = [0]
+        self._selections = []
+        self._build_stack = []
         self.reset(rewind)
 
     def __iter__(self):
-        for result in self._parse_value():
-            yield result
+        batch = []
+        while self.next_batch(self.batch_size, batch):
+            # checkpoint() counts the events taken from this iterator
+            self._batch_iter = iter(batch)
+            for result in self._batch_iter:
+                yield result
 
     def __next__(self):
         return self.next()
@@ -132,93 +412,798 @@ class Parser(object):
     def next(self):
         '''Return next item from iterator'''
         if self._iter is None:
-            self._iter = self._parse_value()
+            self._iter = iter(self)
         return next(self._iter)
 
+    def next_batch(self, size=1024, out=None):
+        '''Returns a list of up to `size` events, which is empty once the
+        file is exhausted. If `out` is given it is cleared and refilled
+        instead of creating a new list. More data is only read while no
+        events are available, so streams are not held up waiting for a full
+        batch. '''
+        if out is None:
+            out = []
+        else:
+            del out[:]
+        self._batch = out
+        self._batch_iter = None
+        if self._started is None:
+            self._started = time.time()
+        if self._carry:
+            # events left over from skipping to a checkpoint
+            out.extend(self._carry)
+            self._carry = None
+        else:
+            self._batch_state = (self._state(), 0)
+            document = self._document
+            while not self._done and not self._starved:
+                if not self._scan(out, size):
+                    self._done = True
+                elif out:
+                    break
+            if self._multi_document:
+                self._tag_documents(out, document)
+        self._events += len(out)
+        if self._count_events:
+            self._count(out)
+        if self._progress is not None:
+            now = time.time()
+            if self._done and not out or (
+                    now - self._progress_time >= self._progress_interval):
+                self._progress_time = now
+                self._progress(self.stats())
+        return out
+
+    def stats(self):
+        '''Returns a dict of counters for the data parsed so far: `bytes_read`
+        (characters for text input), `fill_calls` (reads), `events`,
+        `max_depth` (of the collections entered), `position` (of the scanner
+        in the file), `size` (of the file, or None if unknown), `elapsed`
+        (seconds since the first batch) and `bytes_per_second`. With the
+        `stats` option, `events_by_type` (by class name) and
+        `largest_string` are included. '''
+        elapsed = 0.0
+        if self._started is not None:
+            elapsed = time.time() - self._started
+        position = self._position(
+            self.buffer, self.buffer_offset, self._buffer_start)
+        bytes_read = self._bytes_read
+        if self._map is not None:
+            # a mapped file is read as one buffer, so count what was scanned
+            bytes_read -= max(self._read_position - position, 0)
+        result = {
+            'bytes_read': bytes_read,
+            'fill_calls': self._fill_calls,
+            'events': self._events,
+            'max_depth': self._max_depth - 1,
+            'position': position,
+            'size': self._size(),
+            'elapsed': elapsed,
+            'bytes_per_second': bytes_read / elapsed if elapsed else 0.0,
+        }
+        if self._count_events:
+            result['events_by_type'] = dict(
+                (cls.__name__, count)
+                for cls, count in self._event_types.items())
+            result['largest_string'] = self._largest_string
+        return result
+
+    def _reset_stats(self):
+        '''Clears the counters reported by `stats`. '''
+        self._started = None
+        self._progress_time = 0.0
+        self._bytes_read = 0
+        self._fill_calls = 0
+        self._events = 0
+        self._max_depth = 1
+        self._event_types = {}
+        self._largest_string = 0
+        self._string_length = 0
+
+    def _count(self, events):
+        '''Counts events by type, and measures strings, for `stats`. '''
+        types = self._event_types
+        largest = self._largest_string
+        length = self._string_length
+        for event in events:
+            value = event[-1]
+            cls = value.__class__
+            types[cls] = types.get(cls, 0) + 1
+            if cls is TEXT:
+                if len(value) > largest:
+                    largest = len(value)
+            elif cls is StringChunk:
+                length += len(value.value)
+            elif cls is StringEnd:
+                if length > largest:
+                    largest = length
+                length = 0
+        self._largest_string = largest
+        self._string_length = length
+
+    def _size(self):
+        '''Returns the size of the file, if known. '''
+        if self._map is not None:
+            return len(self._map)
+        try:
+            return os.fstat(self.reader.fileno()).st_size
+        except (AttributeError, io.UnsupportedOperation, OSError, ValueError):
+            return None
+
+    def checkpoint(self):
+        '''Returns the parser's position, after the events yielded so far, as
+        a dict of plain values that may be pickled (or saved as json, unless
+        an item is partly built). `resume` continues from it. Positions are
+        byte offsets for binary input, and require a stateless encoding such
+        as utf-8, and text file objects other than `StringIO` are rejected, as
+        their positions are not character offsets. Parsers with
+        `number_blocks` are rejected too, as their blocks end with the
+        buffers, which a resumed parser reads from another offset. '''
+        self._check_positions('checkpoint()')
+        if self._number_run is not None:
+            raise ValueError(
+                'checkpoint() is not supported with number_blocks')
+        remaining = 0
+        if self._batch_iter is not None:
+            remaining = self._batch_iter.__length_hint__()
+        if remaining or self._carry:
+            state, events = self._batch_state
+            events += len(self._batch) - remaining
+        else:
+            state, events = self._state(), 0
+        (buffer, buffer_offset, buffer_start, parts, modes, expect, string,
+         string_chunked, skip, document, item) = state
+        if string is not None:
+            chunks, length = string
+            string = ''.join(chunks[:length])
+        item_depth = 0
+        if item is not None:
+            item_depth = len(item)
+            item = self._copy_item(item)
+        return {
+            'offset': self._position(buffer, buffer_offset, buffer_start),
+            'parts': list(parts),
+            'modes': list(modes),
+            'expect': expect,
+            'string': string,
+            'string_chunked': string_chunked,
+            'skip': skip,
+            'document': document,
+            'item': item,
+            'item_depth': item_depth,
+            'events': events,
+        }
+
+    @classmethod
+    def resume(cls, file_object, state, **kwargs):
+        '''Returns a parser continuing from a `checkpoint` of a parser of the
+        same file, which must have had the same options (`kwargs`). '''
+        parser = cls(file_object, rewind=False, **kwargs)
+        parser._restore(state)  # pylint: disable=protected-access
+        return parser
+
+    def _use_bytes(self):
+        '''Switches to scanning bytes, rather than text. Keys, strings and
+        numbers are decoded as they are returned. '''
+        for name in self.text_patterns:
+            pattern = getattr(self, name)
+            setattr(self, name, re.compile(
+                pattern.pattern.encode('ascii'), pattern.flags & ~re.UNICODE))
+        # which also decodes views of the mapped file
+        decode = codecs.getdecoder(self._encoding)
+        self._decode = lambda data: decode(data)[0]
+        self._number_converters = tuple(
+            converter if converter is float or converter is int else
+            lambda data, converter=converter: converter(data.decode('ascii'))
+            for converter in self._number_converters)
+
+    def _text(self, data):
+        '''Returns a slice of the buffer as text. '''
+        return data if self._decode is None else self._decode(data)
+
+    def _state(self):
+        '''Returns the scanner's state, as used by `checkpoint`. It is taken
+        for every batch, so a partial string and a partial item are recorded
+        by reference (the chunks and containers are only appended to), and
+        only copied by `checkpoint`. '''
+        chunks = self._string_chunks
+        string = None if chunks is None else (chunks, len(chunks))
+        item = None
+        if self._build_stack:
+            item = tuple((container, len(container))
+                         for container in self._build_stack)
+        return (self.buffer, self.buffer_offset, self._buffer_start,
+                tuple(self._parts), tuple(self._modes), self._expect, string,
+                self._string_chunked, self._skip_state, self._document, item)
+
+    @staticmethod
+    def _copy_item(stack):
+        '''Copies the item under construction as it was when its `stack`, of
+        `(container, length)` pairs, was recorded. '''
+        child = None
+        for container, length in reversed(stack):
+            # the last member of each container is the next one on the stack
+            complete = length - (child is not None)
+            if isinstance(container, list):
+                copied = [copy.deepcopy(value)
+                          for value in container[:complete]]
+                if child is not None:
+                    copied.append(child)
+            else:
+                keys = list(itertools.islice(container, length))
+                copied = {}
+                for key in keys[:complete]:
+                    copied[key] = copy.deepcopy(container[key])
+                if child is not None:
+                    copied[keys[-1]] = child
+            child = copied
+        return child
+
+    def _check_positions(self, operation):
+        '''Raises ValueError if the file object is a text file whose
+        positions are not offsets in its characters (e.g. `io.open(filename,
+        encoding='utf-8')`, which seeks to opaque cookies). '''
+        if isinstance(self.reader, io.TextIOBase) and not isinstance(
+                self.reader, io.StringIO):
+            raise ValueError('{} requires a binary file object or a StringIO, '
+                             'not {}'.format(operation,
+                                             type(self.reader).__name__))
+
+    def _restore(self, state):
+        '''Returns to a `checkpoint` state. '''
+        self._check_positions('resume()')
+        self.reset(rewind=False)
+        self.reader.seek(state['offset'], 0)
+        self._read_position = self._buffer_start = state['offset']
+        parts = state['parts']
+        self._restore_scope(parts, state['modes'])
+        self._floor = 1
+        self._expect = state['expect']
+        if state['string'] is not None:
+            self._string_chunks = [state['string']]
+            self._string_size = len(state['string'])
+            self._string_chunked = state['string_chunked']
+        if state['skip'] is not None:
+            self._skip_state = tuple(state['skip'])
+        self._document = state['document']
+        if state['item'] is not None:
+            stack = [copy.deepcopy(state['item'])]
+            for part in parts[len(parts) - state['item_depth']:-1]:
+                stack.append(stack[-1][part])
+            self._build_stack = stack
+        # skip the events yielded before the checkpoint
+        skip = state['events']
+        batch = []
+        while skip and self.next_batch(skip, batch):
+            if len(batch) > skip:
+                self._carry = batch[skip:]
+                self._batch_state = (self._batch_state[0], skip)
+                break
+            skip -= len(batch)
+        else:
+            self._batch_state = (self._state(), 0)
+        self._batch = []
+        # the skipped events were yielded before the checkpoint
+        self._events = 0
+        self._event_types = {}
+        self._largest_string = self._string_length = 0
+
+    def _position(self, buffer, offset, buffer_start):
+        '''Returns the position in the file of `buffer[offset]`, given the
+        position of the buffer's start. '''
+        if self._decoder is None:
+            return buffer_start + offset
+        return buffer_start + len(buffer[:offset].encode(self._encoding))
+
+    def feed(self, data):
+        '''Adds a chunk of data (bytes or text) to a parser created without a
+        file object, and returns a list of the events completed so far.
+        Partial tokens are kept until the next `feed` or `close`. '''
+        if self._pending is None:
+            raise ValueError('feed() requires a parser without a file object')
+        if self._closed:
+            raise ValueError('feed() called after close()')
+        if data:
+            self._pending.append(data)
+        self._starved = False
+        return self._drain()
+
+    def close(self):
+        '''Signals the end of the data given to `feed`, returning the
+        remaining events. Raises ValueError if the document is incomplete. '''
+        if self._pending is None:
+            raise ValueError('close() requires a parser without a file object')
+        self._closed = True
+        self._starved = False
+        return self._drain()
+
+    def release(self):
+        '''Releases the resources held by the parser: stops its read ahead
+        thread and unmaps the file, and closes the file object if the parser
+        opened it (as `load_path` does). The parser can not be used
+        afterwards. Also called at the end of a `with` block. '''
+        if isinstance(self.reader, ReadAhead):
+            self.reader.stop()
+        if self._map is not None:
+            # views of the map would keep it from closing
+            self.buffer = b''
+            self._batch_state = None
+            if hasattr(self._map, 'close'):
+                self._map.close()
+        if self._owned_file is not None:
+            self._owned_file.close()
+            self._owned_file = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.release()
+
+    def _drain(self):
+        '''Returns all events that can be parsed from the available data. '''
+        events = []
+        batch = []
+        while self.next_batch(self.batch_size, batch):
+            events.extend(batch)
+        return events
+
+    def iter_batches(self, size=1024, out=None):
+        '''Yields lists of up to `size` events until the file is exhausted.
+        If `out` is given it is reused for every batch. '''
+        while True:
+            batch = self.next_batch(size, out)
+            if not batch:
+                return
+            yield batch
+
     def reset(self, rewind=True):
         '''Return the file pointer to the beginning of the file.
         NOTE: Not all data sources will support this.'''
-        if rewind:
+        if rewind and self.reader is not None:
             self.reader.seek(0, 0)
-        self.buffer = ''
+        self.buffer = '' if self._map is None else b''
         self.buffer_offset = 0
+        self._decoder = None
+        # the position of the end of the data read, and of the buffer's start
+        self._read_position = 0
+        if not rewind and self.reader is not None:
+            try:
+                self._read_position = self.reader.tell()
+            except (AttributeError, IOError, OSError, ValueError):
+                pass
+        self._buffer_start = self._read_position
+        # the number of bytes left to read, when reading part of a file
+        self._remaining = None
+        self._eof = False
+        self._done = False
+        self._starved = False
+        self._closed = False
+        if self._pending is not None:
+            self._pending.clear()
+        self._expect = _VALUE
+        self._string_chunks = None
+        self._string_size = 0
+        self._string_chunked = False
+        self._skip_state = None
+        self._document = -1
+        del self._document_marks[:]
+        self._batch = []
+        self._batch_iter = None
+        self._batch_state = None
+        self._carry = None
+        self._iter = None
+        self._reset_stats()
 
-        self._path = '$'
-        if self._list_paths:
-            self._path = ['$']
+        self._path = self._root_path()
         self._part = '$'
         self._mode = 0
         self._parts = ['$']
         self._paths = [self._path]
         self._modes = [0]
+        # the number of scopes open at the start (see _restore_scope)
+        self._floor = 1
+        self._selector = self._paths_selector
+        self._selections = [] if self._selector is None else [
+            self._selector.root]
+        self._build_stack = []
+
+    def seek_path(self, path, index=None):
+        '''Restricts parsing to the value at `path` (a concrete jsonpath or a
+        sequence of parts), seeking the file straight to it and reading only
+        its bytes. The value is located with an `Index` from `build_index`,
+        either `index` or the file's saved index. Values deeper than the index
+        are found by filtering their indexed ancestor, which replaces the
+        `paths` option. Returns the parser; `reset` restores parsing of the
+        whole file. The file object must be binary, as the index holds byte
+        offsets, and ValueError is raised if the index is stale. '''
+        if isinstance(self.reader, io.TextIOBase):
+            raise ValueError('seek_path() requires a binary file object, not '
+                             '{}'.format(type(self.reader).__name__))
+        size = self._size()
+        if index is None:
+            if self._index is None:
+                self._index = Index.load(
+                    self.reader.name + INDEX_SUFFIX, size)
+            index = self._index
+        elif size is not None:
+            index.check(size)
+        if isinstance(path, STRING_TYPES):
+            path = parse_parts(path)
+        start, end, parts = index.find(path)
+        self.reset(rewind=False)
+        self.reader.seek(start, 0)
+        self._read_position = self._buffer_start = start
+        self._remaining = end - start
+        if len(parts) < len(path):
+            # steps of the parts, as keys need not be valid in a jsonpath
+            self._selector = Selector([[
+                (False, frozenset([part])) for part in path[1:]]])
+            self._selections = [self._selector.root]
+        if len(parts) > 1:
+            self._restore_scope(parts, [self._NONE] + [
+                self._OBJECT if isinstance(part, STRING_TYPES) else self._LIST
+                for part in parts[1:]])
+            self._expect = _VALUE
+        return self
 
-    def _parse_value(self):
-        '''Read a value from a json file object. A value can be a number,
-        string, null, object, or list. '''
+    def _restore_scope(self, parts, modes):
+        '''Starts parsing within nested scopes, given as lists of parts and
+        modes starting with the root ('$' and `_NONE`), as though their
+        opening brackets had been read. This allows a fragment of a document
+        (such as a range of array elements or object members) to be parsed,
+        and the input may then end within these scopes. '''
+        for part, mode in zip(parts[1:], modes[1:]):
+            self._enter_mode(mode, part)
+        self._floor = len(self._modes)
+        if self._mode == self._LIST:
+            self._expect = _VALUE
+        elif self._mode == self._OBJECT:
+            self._expect = _KEY
+
+    def _scan(self, out, limit):
+        '''Tokenizes the buffer with `token_pattern`, appending events to
+        `out` until it holds `limit` events or the buffer ends. Returns false
+        once the end of the file has been reached. '''
+        # pylint: disable=too-many-branches,too-many-statements
+        match_token = self.token_pattern.match
+        max_string = self._max_string
+        parse_int, parse_float = self._number_converters
+        decode = self._decode
+        multi_document = self._multi_document
+        hybrid = self._hybrid
+        # the whole of a mapped file is one buffer, so long strings are read
+        # in windows rather than matched whole
+        mapped_strings = self._map is not None and max_string
+        if self._expect >= _IN_STRING and not self._resume(out):
+            return True
+        buffer = self.buffer
+        offset = self.buffer_offset
+        expect = self._expect
         while True:
-            char = self._read()
-            if self._mode == self._OBJECT:
-                if char == ',':
-                    if self._part is None:
-                        self.error("Syntax Error: Unexpected ','.")
-                    self._part = None
-                    continue
-                elif char == '}':
-                    self._exit_mode()
-                    if self.terminators:
-                        yield self._path, self.end_object
-                    continue
-                elif self._part is not None:
+            if len(out) >= limit:
+                self.buffer_offset = offset
+                self._expect = expect
+                return True
+            match = match_token(buffer, offset)
+            if match is None or (
+                    _NUMBER <= match.lastindex <= _EXPONENT and
+                    len(buffer) - match.end() < 3 and not self._eof and
+                    self.number_tail_pattern.match(buffer, match.end())):
+                # a partial token (numbers may continue in the next buffer)
+                self._expect = expect
+                return self._scan_end(out, offset, match is not None)
+            kind = match.lastindex
+            offset = match.end()
+
+            if kind == _OBJECT_END or kind == _ARRAY_END:
+                if kind == _OBJECT_END:
+                    mode, start = self._OBJECT, _KEY_OR_END
+                else:
+                    mode, start = self._LIST, _VALUE_OR_END
+                if self._mode != mode or (expect != _NEXT and expect != start):
+                    self.error(
+                        "Syntax Error: Unexpected character '{}'".format(
+                            self._text(match.group(kind))))
+                self._exit_mode()
+                end_token = (self.end_object if mode == self._OBJECT
+                             else self.end_array)
+                if self._items:
+                    item = self._build(end_token)
+                    if item is not _PENDING:
+                        out.append((self._path, item))
+                elif self.terminators and self._is_accepted():
+                    out.append((self._path, end_token))
+                expect = _NEXT if self._mode else _VALUE
+                continue
+
+            elif expect == _NEXT:
+                if kind != _COMMA:
                     self.error("Syntax Error: Expected ',' ('{}')".format(
-                        char
-                    ))
-                elif char != '"':
-                    self.error("Syntax Error: Expected object key")
-                key = self._parse_string(char)
-                char = self._read()
-                if char != ':':
+                        self._text(match.group(kind))))
+                if self._mode == self._LIST:
+                    self._update_mode(self._part + 1)
+                    expect = _VALUE
+                else:
+                    expect = _KEY
+                continue
+
+            elif expect == _COLON:
+                if kind != _COLON_TOKEN:
                     self.error("Syntax Error: Expected ':'")
+                expect = _VALUE
+                continue
+
+            elif expect >= _KEY:
+                if kind == _STRING:
+                    key = match.group(kind)
+                    if decode is not None:
+                        key = decode(key)
+                elif kind == _STRING_START:
+                    self.buffer_offset = offset
+                    key = self._parse_string()
+                    if key is _PARTIAL:
+                        self._expect = _IN_KEY
+                        return True
+                    buffer, offset = self.buffer, self.buffer_offset
+                else:
+                    self.error("Syntax Error: Expected object key")
                 self._update_mode(key)
-                char = self._read()
-            elif self._mode == self._LIST:
-                if char == ',':
-                    self._update_mode(self._part+1)
+                expect = _COLON
+                continue
+
+            if multi_document and not self._mode:
+                self._document += 1
+                self._document_marks.append((len(out), self._document))
+
+            if self._selections:
+                selection = self._selections[-1]
+                if not self._selector.accepts(selection) and not (
+                        selection and
+                        (kind == _OBJECT_START or kind == _ARRAY_START)):
+                    if kind == _STRING_START or kind == _OBJECT_START or (
+                            kind == _ARRAY_START):
+                        self.buffer_offset = offset
+                        if not self._skip_value(
+                                int(kind != _STRING_START),
+                                kind == _STRING_START):
+                            self._expect = _IN_SKIP
+                            return True
+                        buffer, offset = self.buffer, self.buffer_offset
+                    expect = _NEXT if self._mode else _VALUE
                     continue
-                elif char == ']':
-                    self._exit_mode()
-                    if self.terminators:
-                        yield self._path, self.end_array
+
+            if self._number_run is not None and (
+                    _NUMBER <= kind <= _EXPONENT and self._mode == self._LIST
+                    and (not self._selections or self._selector.accepts(
+                        self._selections[-2]))):
+                offset = self._number_block(out, match.start(_NUMBER))
+                expect = _NEXT
+                continue
+            if hybrid and (kind == _OBJECT_START or kind == _ARRAY_START):
+                end = self._decode_native(out, buffer, match.start(kind))
+                if end is not None:
+                    offset = end
+                    expect = _NEXT if self._mode else _VALUE
                     continue
-            if not char:
-                if self._mode != self._NONE:
-                    self.error("Unexpected end of file")
-                break
-            elif char == '{':
-                if self.terminators:
-                    yield self._path, self.start_object
+            if mapped_strings and kind == _STRING and (
+                    match.end(kind) - match.start(kind) > max_string):
+                offset = match.start(kind)
+                kind = _STRING_START
+            if kind == _STRING:
+                value = match.group(kind)
+                if decode is not None:
+                    value = decode(value)
+                if max_string and len(value) > max_string:
+                    self._emit_chunks(out, [value], True)
+                    expect = _NEXT if self._mode else _VALUE
+                    continue
+            elif kind == _NUMBER:
+                value = parse_int(match.group(kind))
+            elif kind == _FRACTION or kind == _EXPONENT:
+                # (as bytes, where the buffer is a view)
+                value = parse_float(match.group(0).lstrip())
+            elif kind == _STRING_START:
+                self.buffer_offset = offset
+                value = self._parse_string(out)
+                buffer, offset = self.buffer, self.buffer_offset
+                if value is _PARTIAL:
+                    # return, so that any chunks are yielded
+                    self._expect = _IN_STRING
+                    return True
+                elif value is _PENDING:
+                    expect = _NEXT if self._mode else _VALUE
+                    continue
+            elif kind == _OBJECT_START:
+                if self._items:
+                    self._build(self.start_object)
+                elif self.terminators and self._is_accepted():
+                    out.append((self._path, self.start_object))
                 self._enter_mode(self._OBJECT, None)
-            elif char == '[':
-                if self.terminators:
-                    yield self._path, self.start_array
+                expect = _KEY_OR_END
+                continue
+            elif kind == _ARRAY_START:
+                if self._items:
+                    self._build(self.start_array)
+                elif self.terminators and self._is_accepted():
+                    out.append((self._path, self.start_array))
                 self._enter_mode(self._LIST, 0)
-            elif char and char in self.digits:
-                yield self._path, self._parse_number(char)
-            elif char and char == '"':
-                yield self._path, self._parse_string(char)
-            elif char == 't' and self._read_chars(3) == 'rue':
-                yield self._path, True
-            elif char == 'f' and self._read_chars(4) == 'alse':
-                yield self._path, False
-            elif char == 'n' and self._read_chars(3) == 'ull':
-                yield self._path, None
-            elif char:
-                self.error(
-                    "Syntax Error: Unexpected character '{}'".format(char)
-                )
+                expect = _VALUE_OR_END
+                continue
+            elif kind == _TRUE:
+                value = True
+            elif kind == _FALSE:
+                value = False
+            elif kind == _NULL:
+                value = None
+            else:
+                self.error("Syntax Error: Unexpected character '{}'".format(
+                    self._text(match.group(kind))))
+            if self._items:
+                value = self._build(value)
+                if value is not _PENDING:
+                    out.append((self._path, value))
+            else:
+                out.append((self._path, value))
+            expect = _NEXT if self._mode else _VALUE
+
+    def _tag_documents(self, out, document):
+        '''Prefixes each event in `out` with the index of its document, the
+        first event belonging to `document`. '''
+        marks = self._document_marks
+        marks.append((len(out), None))
+        start = 0
+        for end, next_document in marks:
+            for i in range(start, end):
+                out[i] = (document,) + out[i]
+            start, document = end, next_document
+        del marks[:]
+
+    def _resume(self, out):
+        '''Continues the string or skipped value that the last `_scan` stopped
+        in. Returns false while it remains incomplete. '''
+        expect = self._expect
+        if expect == _IN_SKIP:
+            if not self._skip_value(*self._skip_state):
+                return False
+        else:
+            value = self._parse_string(out if expect == _IN_STRING else None)
+            if value is _PARTIAL:
+                return False
+            elif expect == _IN_KEY:
+                self._update_mode(value)
+                self._expect = _COLON
+                return True
+            elif value is not _PENDING:
+                if self._items:
+                    value = self._build(value)
+                if value is not _PENDING:
+                    out.append((self._path, value))
+        self._expect = _NEXT if self._mode else _VALUE
+        return True
+
+    def _number_block(self, out, start):
+        '''Parses the run of numbers at `start` (the first of which is known
+        to be complete) into a `NumberBlock`. Returns the end offset. '''
+        buffer = self.buffer
+        end = self._number_run(buffer, start).end()
+        text = self._text(buffer[start:end])
+        if len(buffer) - end < 3 and not self._eof and (
+                self.number_tail_pattern.match(buffer, end)):
+            # the last number may continue in the next buffer
+            end = start + text.rindex(',')
+            text = text[:end - start]
+        if numpy is not None:
+            values = numpy.fromstring(text, dtype=float, sep=',')
+        else:
+            values = array('d', [float(value) for value in text.split(',')])
+        index = self._part
+        out.append((self._paths[-2], NumberBlock(index, values)))
+        if len(values) > 1:
+            self._update_mode(index + len(values) - 1)
+        return end
+
+    def _decode_native(self, out, buffer, start):
+        '''Decodes the collection at `start` with the `json` module, if it
+        ends within `hybrid` characters and the buffer, appending its events.
+        Returns the end offset, or None to scan it instead. '''
+        if self._items and not self._is_accepted():
+            # only whole items are decoded
+            return None
+        data = buffer[start:start + self._hybrid]
+        text = data
+        if self._decode is not None:
+            try:
+                text = self._decode(data)
+            except UnicodeDecodeError as error:
+                # a character cut short at the end
+                text = self._decode(data[:error.start])
+        try:
+            value, end = self._raw_decode(text)
+        except (ValueError, RuntimeError):
+            # too long, too deep, or invalid
+            return None
+        if len(text) != len(data):
+            end = len(text[:end].encode(self._encoding))
+        if self._items:
+            value = self._build(value)
+            if value is not _PENDING:
+                out.append((self._path, value))
+        else:
+            self._emit_decoded(out, value)
+        return start + end
+
+    def _emit_decoded(self, out, value):
+        '''Appends the events of a collection decoded by `json`, with objects
+        as tuples of pairs, as `_scan` would. '''
+        terminators = self.terminators
+        max_string = self._max_string
+        selections = self._selections
+        # the iterators of the members of the collections entered
+        stack = []
+        while True:
+            cls = value.__class__
+            if cls is tuple or cls is list:
+                if terminators and self._is_accepted():
+                    out.append((self._path, self.start_array
+                                if cls is list else self.start_object))
+                if cls is list:
+                    self._enter_mode(self._LIST, 0)
+                    stack.append(enumerate(value))
+                else:
+                    self._enter_mode(self._OBJECT, None)
+                    stack.append(iter(value))
+            elif self._is_accepted():
+                if max_string and cls is TEXT and len(value) > max_string:
+                    self._emit_chunks(out, [value], True)
+                else:
+                    out.append((self._path, value))
+            # move to the next member to emit
+            while stack:
+                for part, value in stack[-1]:
+                    if part or self._mode == self._OBJECT:
+                        self._update_mode(part)
+                    if not selections or selections[-1]:
+                        break
+                else:
+                    stack.pop()
+                    end_token = (self.end_object if self._exit_mode() ==
+                                 self._OBJECT else self.end_array)
+                    if terminators and self._is_accepted():
+                        out.append((self._path, end_token))
+                    continue
+                break
+            else:
+                return
+
+    def _scan_end(self, out, offset, partial=False):
+        '''Handles the end of the buffer at `offset`: reads more data if the
+        remainder may be a partial token (unless events are waiting in
+        `out`), otherwise checks that the document is complete. '''
+        start = self.ws_pattern.match(self.buffer, offset).end()
+        remainder = len(self.buffer) - start
+        if not self._eof and (partial or remainder < _MAX_PARTIAL):
+            if out:
+                self.buffer_offset = offset
+            else:
+                self._refill(offset)
+            return True
+        elif remainder:
+            self.buffer_offset = start
+            self.error("Syntax Error: Unexpected character '{}'".format(
+                self._text(self.buffer[start:start + 1])))
+        elif len(self._modes) != self._floor or (
+                self._expect != (_NEXT if self._mode else _VALUE)):
+            self.error("Unexpected end of file")
+        self.buffer_offset = start
+        return False
 
     def error(self, message):
         '''Raises value error with path information. '''
-        raise ValueError("[{}] {}".format(self._path, message))
+        path = self._path
+        if path is None:
+            path = self._build_path(self._paths[-2], self._part)
+        raise ValueError("[{}] {}".format(path, message))
 
     def _enter_mode(self, mode, part):
         '''Enters a nested scope (object or array). '''
@@ -228,6 +1213,11 @@ class Parser(object):
         self._paths.append(self._path)
         self._mode = mode
         self._modes.append(mode)
+        if len(self._modes) > self._max_depth:
+            self._max_depth = len(self._modes)
+        if self._selections:
+            self._selections.append(
+                self._selector.step(self._selections[-1], part))
 
     def _exit_mode(self):
         '''Leaves a nested scope. '''
@@ -237,6 +1227,8 @@ class Parser(object):
         self._path = self._paths[-1]
         self._part = self._parts[-1]
         self._mode = self._modes[-1]
+        if self._selections:
+            self._selections.pop()
         return mode
 
     def _update_mode(self, part):
@@ -244,159 +1236,327 @@ class Parser(object):
         increment array indices).'''
         self._part = part
         self._parts[-1] = part
-        if self._list_paths:
-            self._path[-1] = part
+        if self._selections:
+            selection = self._selector.step(self._selections[-2], part)
+            self._selections[-1] = selection
+            if not selection and not (self._list_paths or self._lazy_paths):
+                # the value will be skipped, so defer building its path
+                self._path = self._paths[-1] = None
+                return
+        self._path = self._build_path(self._paths[-2], part)
+        self._paths[-1] = self._path
+
+    def _build(self, value):
+        '''Adds a value or terminator to the item under construction. Returns
+        the item once it is complete, otherwise `_PENDING`. '''
+        if not self._is_accepted():
+            return _PENDING
+        stack = self._build_stack
+        if isinstance(value, EndTerminator):
+            value = stack.pop()
+            return _PENDING if stack else value
+        elif isinstance(value, StartTerminator):
+            container = {} if value is self.start_object else []
+            if stack:
+                self._build_add(stack[-1], container)
+            stack.append(container)
+            return _PENDING
+        elif stack:
+            self._build_add(stack[-1], value)
+            return _PENDING
+        return value
+
+    def _build_add(self, container, value):
+        '''Inserts a value into its parent collection. '''
+        if isinstance(container, list):
+            container.append(value)
         else:
-            self._path = self._build_path(self._paths[-2], part)
-            self._paths[-1] = self._path
+            container[self._part] = value
 
-    def _parse_string(self, quote):
-        '''Returns a unicode string up to the quote (file pointer will be at
-        the closing quote). '''
-        output = []
+    def _is_accepted(self):
+        '''Returns true if the current path matches a selected path. '''
+        return (not self._selections or
+                self._selector.accepts(self._selections[-1]))
+
+    def _skip_value(self, depth, in_string):
+        '''Consumes the remainder of a value without decoding it, tracking
+        only bracket and quote depth: a string if `in_string`, within `depth`
+        collections. Returns false if a push parser runs out of data, in which
+        case the next call resumes from `_skip_state`. '''
+        buffer = self.buffer
+        offset = self.buffer_offset
         while True:
-            # value = self._read_until(quote)
-            match = self._read_until_pattern(self.str_pattern)
-            if not match:
-                break
-            value = match.group(1)
-            output.append(value)
-            i = -1
-            # TODO: Make this into a stringbuilder-esque class
-            while abs(i) <= len(value) and value[i] == '\\':
-                i -= 1
-            if i % 2 == 1:
-                break
-            output.append(quote)
-        if not output:
-            return ''
-        elif len(output) > 1:
-            return self._deescape_string(''.join(output))
-        return self._deescape_string(output[0])
-
-    def _deescape_string(self, chars):
-        '''Handled backslash-escaped characters. '''
-        offset = chars.find('\\')
-        buffer = []
-        while offset != -1:
-            buffer.append(chars[0:offset])
-            escape_char = chars[offset+1]
-            if escape_char in self.escaped_chars:
-                buffer.append(self.escaped_chars[escape_char])
-                chars = chars[offset+2:]
-            elif escape_char == 'u':
-                buffer.append(CHR(
-                    int(chars[offset+2:offset+6], 16)
-                ))
-                chars = chars[offset+6:]
+            if in_string:
+                match = self.skip_string_pattern.match(buffer, offset)
+                end = match.end()
+                if match.lastindex:
+                    offset = end
+                    in_string = False
+                    if not depth:
+                        break
+                    continue
+                # keep a trailing backslash, which escapes the next character
             else:
-                buffer.append(chars[offset:offset+2])
-                chars = chars[offset+2:]
-            offset = chars.find('\\')
-        buffer.append(chars)
-        return ''.join(buffer)
-
-    def _parse_number(self, char):
-        '''Return a float from the buffer. The initial `char` is required as
-        numbers do not have terminators so the first chaacter will be
-        consumed. '''
-        value = char + self._read_until(self.digits_terminator)
-        return float(value)
-
-    def _read(self):
-        '''Reads one or more characters, returning the first that is not
-        whitespace. '''
-        match = self._read_pattern(self.ws_pattern)
-        if not match:
-            return ''
-        return match.group(1)
-
-    def _read_chars(self, length):
-        '''Reads one or more characters, returning the first that is not
-        whitespace. '''
-        result = []
-        while len(result) < length:
-            if self.buffer_offset == len(self.buffer):
-                self._fill_buffer()
-            result.append(self.buffer[self.buffer_offset])
-            self.buffer_offset += 1
-        return ''.join(result)
-
-    def _read_until(self, chars=None):
-        '''Searches file from current pointer to one of character. '''
-        min_end = -1
-        result = []
-        while True:
-            for char in chars:
-                pos = self.buffer.find(char, self.buffer_offset)
-                if pos != -1:
-                    if min_end == -1:
-                        min_end = pos
+                match = self.skip_collection_pattern.search(buffer, offset)
+                if match:
+                    offset = match.end()
+                    if match.lastindex == 1:
+                        in_string = True
+                    elif match.lastindex == 2:
+                        depth += 1
                     else:
-                        min_end = min([min_end, pos])
-            if min_end != -1:
-                result.append(self.buffer[self.buffer_offset:min_end])
-                self.buffer_offset = min_end
-                return ''.join(result)
-            result.append(self.buffer[self.buffer_offset:])
-            self._fill_buffer()
-            if not self.buffer:
-                return ''.join(result)
-
-    def _read_pattern(self, pattern):
-        '''Repeatedly applies the pattern to the current buffer (not file)
-        until it returns a match. '''
-        while True:
-            match = pattern.match(self.buffer, self.buffer_offset)
-            if match:
-                self.buffer_offset += len(match.group(0))
-                return match
-            self._fill_buffer()
-            if not self.buffer:
-                return None
-
-    def _read_until_pattern(self, pattern):
-        '''Repeatedly applies the pattern to the current buffer (not file)
-        until it returns a match. '''
-        start = self.buffer_offset
-        target = self.buffer
+                        depth -= 1
+                        if not depth:
+                            break
+                    continue
+                end = len(buffer)
+            if self._eof:
+                self.buffer_offset = end
+                self.error("Unexpected end of file")
+            self._refill(end)
+            buffer = self.buffer
+            offset = self.buffer_offset
+            if self._starved:
+                self._skip_state = (depth, in_string)
+                return False
+        self.buffer_offset = offset
+        return True
+
+    def _parse_string(self, out=None):
+        '''Returns a unicode string, the opening quote having been read. The
+        string is scanned once, in buffer-sized chunks, and escape sequences
+        are decoded as they are found.
+
+        If `out` is given and the string is longer than `max_string` it is
+        instead appended to `out` as `StringChunk` events followed by a
+        `StringEnd`, and `_PENDING` is returned. Whenever chunks are appended
+        before the end of the string `_PARTIAL` is returned, and the next call
+        resumes the string. '''
+        limit = self._max_string if out is not None else None
+        # the bytes of a mapped file read at a time
+        window = None
+        if limit and self._map is not None:
+            window = max(limit, self.buffer_size, 4)
+        chunks = self._string_chunks
+        if chunks is not None:
+            size = self._string_size
+            chunked = self._string_chunked
+            self._string_chunks = None
+        else:
+            chunks = []
+            size = 0
+            chunked = False
+        append = chunks.append
+        decode = self._decode
+        continuation = self.continuation_pattern.match
         while True:
-            match = pattern.match(target, start)
-            if match:
-                self.buffer_offset = (
-                    start + len(self.buffer) + len(match.group(0)) -
-                    len(target))
-                return match
-            self._fill_buffer()
-            if not self.buffer:
-                return None
-            target += self.buffer
+            buffer = self.buffer
+            offset = self.buffer_offset
+            stop = len(buffer)
+            if window is not None:
+                stop = min(stop, offset + window)
+            match = self.string_pattern.match(buffer, offset, stop)
+            closed = match.lastindex
+            end = match.start(1) if closed else match.end()
+            at_window = not closed and end == stop < len(buffer)
+            if at_window:
+                # the end of a window, moved back to a (utf-8) character
+                while continuation(buffer, end):
+                    end -= 1
+            if end > offset:
+                append(buffer[offset:end] if decode is None else
+                       decode(buffer[offset:end]))
+                size += len(chunks[-1])
+            if closed:
+                self.buffer_offset = end + 1
+                if chunked or (limit and size > limit):
+                    self._emit_chunks(out, chunks, True)
+                    return _PENDING
+                return chunks[0] if len(chunks) == 1 else ''.join(chunks)
+            elif at_window:
+                self.buffer_offset = end
+            elif end == len(buffer):
+                self.buffer_offset = end
+                if self._eof:
+                    self.error("Unexpected end of file")
+                self._refill(end)
+                if self._starved:
+                    break
+            elif len(buffer) - end < _MAX_ESCAPE and not self._eof:
+                # the escape sequence may continue in the next buffer
+                self.buffer_offset = end
+                self._refill(end)
+                if self._starved:
+                    break
+            else:
+                self.buffer_offset = end
+                append(self._parse_escape())
+                size += len(chunks[-1])
+            if limit and size >= 2 * limit:
+                # flush whole chunks, keeping the (shorter) remainder
+                chunks = self._emit_chunks(out, chunks, False)
+                size = len(chunks[0])
+                chunked = True
+                break
+        self._string_chunks = chunks
+        self._string_size = size
+        self._string_chunked = chunked
+        return _PARTIAL
+
+    def _emit_chunks(self, out, chunks, final):
+        '''Appends `StringChunk` events of exactly `max_string` characters to
+        `out`, measured from the start of the string. Unless this is the
+        `final` call, returns a new list of chunks holding the remainder, of up
+        to `max_string` characters (`chunks` itself is left unchanged, as a
+        checkpoint may refer to it). '''
+        value = ''.join(chunks)
+        limit = self._max_string
+        start = 0
+        while len(value) - start > limit or (final and start < len(value)):
+            out.append((self._path, StringChunk(value[start:start + limit])))
+            start += limit
+        if final:
+            out.append((self._path, self.string_end))
+            return None
+        return [value[start:]]
+
+    def _parse_escape(self):
+        '''Decodes the escape sequence at the current offset. '''
+        match = self.escape_pattern.match(self.buffer, self.buffer_offset)
+        if not match:
+            self.error("Unexpected end of file")
+        self.buffer_offset = match.end()
+        high, low, code, char = match.groups()
+        if char is not None:
+            char = self._text(char)
+            return self.escaped_chars.get(char, '\\' + char)
+        elif code is not None:
+            return CHR(int(code, 16))
+        high, low = int(high, 16), int(low, 16)
+        try:
+            return CHR(0x10000 + ((high - 0xD800) << 10) + (low - 0xDC00))
+        except ValueError:
+            # narrow python builds store the surrogate pair as is
+            return CHR(high) + CHR(low)
+
+    def _refill(self, offset):
+        '''Reads more data, keeping the unscanned remainder of the buffer. '''
+        remainder = self.buffer[offset:]
+        if remainder.__class__ is memoryview:
+            remainder = remainder.tobytes()
+        self._fill_buffer()
+        if not self.buffer and not self._starved:
+            self._eof = True
+        if remainder:
+            self.buffer = remainder + self.buffer
+            if self._decoder is None:
+                self._buffer_start -= len(remainder)
+            else:
+                self._buffer_start -= len(remainder.encode(self._encoding))
 
     def _fill_buffer(self):
-        '''Reads from file object into buffer. '''
-        byte_buffer = self.reader.read(self.buffer_size)
+        '''Reads from file object into buffer. Binary input is decoded
+        incrementally, so multi-byte characters may span reads. An empty
+        buffer signifies the end of the file, unless `_starved` is set (a push
+        parser waiting for more data). '''
+        self.buffer_offset = 0
+        self._fill_calls += 1
+        if self._map is not None:
+            # the file is scanned in place, as a single buffer
+            start = self._read_position
+            end = len(self._map)
+            if self._remaining is not None:
+                # a range of the file, viewed without copying it
+                end = min(end, start + self._remaining)
+                self._remaining -= end - start
+                if _BUFFER is not None:
+                    self.buffer = _BUFFER(
+                        self._map, start, max(end - start, 0))
+                else:
+                    self.buffer = memoryview(self._map)[start:end]
+                self._buffer_start = start
+            elif start < end:
+                self.buffer = self._map
+                self.buffer_offset = start
+                self._buffer_start = 0
+            else:
+                self.buffer = b''
+                self._buffer_start = end
+            self._bytes_read += max(end - start, 0)
+            self._read_position = end
+            return
         while True:
-            try:
-                if self._is_python2:
-                    self.buffer = byte_buffer.decode(self._encoding)
+            if self._pending is not None:
+                if self._pending:
+                    data = self._pending.popleft()
+                elif self._closed:
+                    data = b'' if self._decoder is not None else ''
                 else:
-                    self.buffer = byte_buffer
-                break
-            except UnicodeDecodeError:
-                byte_buffer += self.reader.read(1)
-        self.buffer_offset = 0
+                    # wait for the next feed()
+                    self._starved = True
+                    self.buffer = ''
+                    return
+                if self._decoder is None and isinstance(data, bytes):
+                    self._init_decoder()
+            elif self._read_view is not None and self._decoder is not None:
+                view = self._read_view
+                if self._remaining is not None:
+                    view = view[:self._remaining]
+                data = view[:self.reader.readinto(view)]
+            else:
+                size = self.buffer_size
+                if self._remaining is not None:
+                    size = min(size, self._remaining)
+                data = self.reader.read(size)
+                if self._decoder is None and isinstance(data, bytes):
+                    self._init_decoder()
+            if self._remaining is not None:
+                self._remaining -= len(data)
+            self._bytes_read += len(data)
+            if self._decoder is None:
+                self._buffer_start = self._read_position
+                self._read_position += len(data)
+                self.buffer = data
+                return
+            # the buffer starts with any bytes held over by the decoder
+            self._buffer_start = (
+                self._read_position - len(self._decoder.getstate()[0]))
+            self._read_position += len(data)
+            self.buffer = self._decoder.decode(data, not data)
+            if self.buffer or not data:
+                return
 
-    def _build_path(self, prefix, path):
-        '''Constructs a jsonpath given a current path and new part. '''
-        if self._list_paths:
-            return prefix + [path]
-        if path is None:
-            path = ''
-        if isinstance(path, int):
-            return '{}[{}]'.format(prefix, path)
-        elif self.key_pattern.match(path):
-            return '{}.{}'.format(prefix, path)
-        return "{}['{}']".format(prefix, path)
+    def _init_decoder(self):
+        '''Prepares for reading binary data. '''
+        self._decoder = codecs.getincrementaldecoder(self._encoding)()
+        # Python 2 decoders can not decode a memoryview, so data is read
+        if self._read_view is None and hasattr(self.reader, 'readinto') and (
+                bytes is not str):
+            self._read_view = memoryview(bytearray(self.buffer_size))
+
+    def _root_path(self):
+        '''Returns the path of the document root. '''
+        if self._lazy_paths:
+            return Path()
+        elif self._list_paths:
+            return ['$']
+        return '$'
+
+    @staticmethod
+    def _build_path(prefix, path):
+        '''Constructs a jsonpath given a current path and new part. Replaced
+        per instance when paths are yielded as lists or `Path`s. '''
+        if path.__class__ is int:
+            return '%s[%d]' % (prefix, path)
+        try:
+            return prefix + _segments[path]
+        except KeyError:
+            return prefix + render_part(path)
+
+    @staticmethod
+    def _build_list_path(prefix, path):
+        '''Constructs a list path given a current path and new part. '''
+        return prefix + [path]
 
 def loads(json_string, *args, **kwargs):
     '''Load a json object via string. '''
@@ -410,6 +1570,10 @@ def loads(json_string, *args, **kwargs):
             from io import StringIO
             python2 = False
 
+    if not python2 and isinstance(json_string, bytes):
+        from io import BytesIO
+        return Parser(BytesIO(json_string), *args, **kwargs)
+
     buffer = StringIO()
     if python2:
         import codecs
@@ -429,3 +1593,29 @@ def loads(json_string, *args, **kwargs):
 def load(json_file, *args, **kwargs):
     '''Load a json object via file object. '''
     return Parser(json_file, *args, **kwargs)
+
+def load_path(path, mmap=True, **kwargs):
+    '''Load a json object via file name. By default the file is mapped into
+    memory and scanned in place, unless it is compressed, when it is
+    decompressed by a read ahead thread instead. The file is closed by the
+    parser's `release`, e.g. at the end of a `with` block. '''
+    json_file = open(path, 'rb')
+    parser = None
+    try:
+        if detect_compression(json_file):
+            mmap = False
+            kwargs.setdefault('read_ahead', 2)
+        parser = Parser(json_file, mmap=mmap, **kwargs)
+        parser._owned_file = json_file  # pylint: disable=protected-access
+    finally:
+        if parser is None:
+            json_file.close()
+    return parser
+
+def items(json_file, prefix, **kwargs):
+    '''Yields each complete value (dict, list or scalar) found at the
+    jsonpath `prefix`, e.g. `'$.records[*]'`. Only one item is held in memory
+    at a time. '''
+    for event in Parser(json_file, paths=prefix, items=True, **kwargs):
+        # the last of (path, item) or (document, path, item)
+        yield event[-1]
@@ -0,0 +1,51 @@
+'''Structural scanning of raw json bytes (in an ASCII compatible encoding),
+tracking only brackets and strings, used to split and index files without
+parsing them. '''
+
+from __future__ import print_function, unicode_literals
+
+import io
+import mmap
+import os
+import re
+
+string_pattern = br'"[^"\\]*(?:\\.[^"\\]*)*"'
+# skips strings (and anything but brackets) to the next bracket, or to the
+# next bracket or comma between the elements of a collection
+structure_pattern = re.compile(
+    br'[^"\[\]{}]*(?:' + string_pattern + br'[^"\[\]{}]*)*'
+    br'(?:([\[{])|([\]}]))')
+element_pattern = re.compile(
+    br'[^"\[\]{},]*(?:' + string_pattern + br'[^"\[\]{},]*)*'
+    br'(?:([\[{])|([\]}])|(,))')
+ws_pattern = re.compile(br'[ \t\n\r]*')
+
+OPEN = 1
+CLOSE = 2
+COMMA = 3
+
+
+def map_file(fp):
+    '''Returns the contents of a binary file object as a read only mmap, or
+    as bytes if it cannot be mapped. '''
+    try:
+        fileno = fp.fileno()
+    except (AttributeError, io.UnsupportedOperation):
+        fp.seek(0)
+        return fp.read()
+    if not os.fstat(fileno).st_size:
+        return b''
+    return mmap.mmap(fileno, 0, access=mmap.ACCESS_READ)
+
+
+def skip_container(data, offset):
+    '''Returns the offset just past the end of the collection whose opening
+    bracket ends at `offset`. '''
+    depth = 1
+    while depth:
+        match = structure_pattern.match(data, offset)
+        if not match:
+            raise ValueError('Unexpected end of file')
+        offset = match.end()
+        depth += 1 if match.lastindex == OPEN else -1
+    return offset
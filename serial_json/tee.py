@@ -0,0 +1,209 @@
+'''Fan-out of the events of a single parse to several consumers, each
+receiving the events under its own jsonpath patterns. '''
+
+from __future__ import print_function, unicode_literals
+
+import threading
+
+try:
+    import queue
+except ImportError:
+    import Queue as queue
+
+from .jsonpath import STRING_TYPES, Selector
+from .serial_json import Parser
+
+
+class Consumer(object):
+    '''A receiver of the events of `tee` which match `paths` (jsonpath
+    patterns, as for `load(paths=...)`, or None for all events).
+
+    `sink` is either a callable, called with the items of each event (`path,
+    value`, or `document, path, value` for multi_document parsers), or a
+    started coroutine, which is sent each event tuple and closed at the end.
+    A `threaded` consumer runs on a worker thread, which is handed the events
+    of each parser batch through a queue of at most `queue_size` batches, so
+    the parse (and every other consumer) only waits for it once it falls that
+    far behind. '''
+    def __init__(self, sink, paths=None, threaded=False, queue_size=8):
+        if isinstance(paths, STRING_TYPES):
+            paths = [paths]
+        self.sink = sink
+        self.paths = list(paths) if paths is not None else None
+        self.threaded = threaded
+        self.queue_size = queue_size
+        self._send = getattr(sink, 'send', None)
+        # the events of the current batch
+        self._pending = []
+        self._queue = None
+        self._thread = None
+        self._error = None
+
+    def _deliver(self, events):
+        '''Hands events to the sink. '''
+        send = self._send
+        if send is not None:
+            for event in events:
+                send(event)
+        else:
+            sink = self.sink
+            for event in events:
+                sink(*event)
+
+    def _start(self):
+        '''Starts the worker thread of a threaded consumer. '''
+        if self.threaded:
+            self._queue = queue.Queue(self.queue_size)
+            self._thread = threading.Thread(target=self._run)
+            self._thread.daemon = True
+            self._thread.start()
+
+    def _flush(self):
+        '''Hands over the events of a batch, raising the error of a failed
+        worker thread. '''
+        if self._error is not None:
+            raise self._error
+        if self._pending:
+            events, self._pending = self._pending, []
+            if self._queue is None:
+                self._deliver(events)
+            else:
+                self._queue.put(events)
+
+    def _run(self):
+        '''Worker thread. Once the sink has failed, the remaining batches are
+        discarded, so the parse is not blocked. '''
+        while True:
+            events = self._queue.get()
+            if events is None:
+                return
+            if self._error is None:
+                try:
+                    self._deliver(events)
+                except Exception as error:  # pylint: disable=broad-except
+                    self._error = error
+
+    def _finish(self):
+        '''Waits for the worker thread, and closes a coroutine. Returns the
+        error of the worker thread, if any. '''
+        if self._thread is not None:
+            self._queue.put(None)
+            self._thread.join()
+            self._thread = None
+            self._queue = None
+        if self._send is not None and hasattr(self.sink, 'close'):
+            self.sink.close()
+        return self._error
+
+
+class _Router(object):
+    '''Finds the consumers of each event path, given as a `Path`. The
+    selector state of a path is stepped from that of its parent, which is
+    found on the chain of ancestors of the previous event path. '''
+    def __init__(self, consumers):
+        patterns = []
+        self._owners = []
+        for consumer in consumers:
+            for pattern in consumer.paths or ():
+                patterns.append(pattern)
+                self._owners.append(consumer)
+        self._consumers = consumers
+        self._selector = Selector(patterns) if patterns else None
+        # consumers by the set of patterns a state accepts
+        self._targets = {}
+        # the (Path, state) of each ancestor of the last path, and the
+        # position of each on the chain by id
+        self._chain = []
+        self._ids = {}
+
+    def targets(self, path):
+        '''Returns the consumers of an event at `path`. '''
+        if self._selector is None:
+            return self._consumers
+        accepted = self._selector.accepted(self._state(path))
+        try:
+            return self._targets[accepted]
+        except KeyError:
+            owners = set(self._owners[pattern] for pattern in accepted)
+            targets = self._targets[accepted] = [
+                consumer for consumer in self._consumers
+                if consumer.paths is None or consumer in owners]
+            return targets
+
+    def _state(self, path):
+        '''Returns the selector state of a path. '''
+        chain = self._chain
+        ids = self._ids
+        pending = []
+        node = path
+        while node is not None and id(node) not in ids:
+            pending.append(node)
+            node = node.parent
+        if node is None:
+            # a new root
+            node = pending.pop()
+            del chain[:]
+            ids.clear()
+            state = self._selector.root
+            ids[id(node)] = 0
+            chain.append((node, state))
+        else:
+            index = ids[id(node)]
+            for ancestor, _ in chain[index + 1:]:
+                del ids[id(ancestor)]
+            del chain[index + 1:]
+            state = chain[index][1]
+        step = self._selector.step
+        for node in reversed(pending):
+            state = step(state, node.part)
+            ids[id(node)] = len(chain)
+            chain.append((node, state))
+        return state
+
+
+def tee(json_file, consumers, **kwargs):
+    '''Parses `json_file` once, handing each event to those `consumers`
+    whose paths match it, as `load(json_file, paths=...)` would yield it.
+    Consumers are `Consumer`s, or plain callables receiving all events. Other
+    keyword arguments are passed to the `Parser`, which skips collections no
+    consumer selects. The first error of a consumer stops the parse and is
+    raised. Returns the parser, e.g. for its `stats()`. '''
+    if kwargs.get('paths') is not None or kwargs.get('items'):
+        raise ValueError('tee takes paths per consumer, and builds no items')
+    kwargs.pop('paths', None)
+    list_paths = kwargs.pop('list_paths', False)
+    lazy_paths = kwargs.pop('lazy_paths', False)
+    consumers = [consumer if isinstance(consumer, Consumer)
+                 else Consumer(consumer) for consumer in consumers]
+    paths = None
+    if all(consumer.paths is not None for consumer in consumers):
+        paths = [path for consumer in consumers for path in consumer.paths]
+    # events are routed by the parts of their paths
+    parser = Parser(json_file, paths=paths, lazy_paths=True, **kwargs)
+    targets_of = _Router(consumers).targets
+    for consumer in consumers:
+        consumer._start()  # pylint: disable=protected-access
+    error = None
+    try:
+        batch = []
+        while parser.next_batch(parser.batch_size, batch):
+            for event in batch:
+                targets = targets_of(event[-2])
+                if not targets:
+                    continue
+                if not lazy_paths:
+                    path = event[-2]
+                    path = list(path.parts) if list_paths else str(path)
+                    event = event[:-2] + (path, event[-1])
+                for consumer in targets:
+                    consumer._pending.append(event)  # pylint: disable=W0212
+            for consumer in consumers:
+                consumer._flush()  # pylint: disable=protected-access
+    finally:
+        for consumer in consumers:
+            failure = consumer._finish()  # pylint: disable=protected-access
+            if error is None:
+                error = failure
+    if error is not None:
+        raise error
+    return parser
@@ -1,10 +1,13 @@
 #!/usr/bin/python
 # -*- coding: utf-8 -*-
 
-from __future__ import print_function, unicode_literals
+from __future__ import absolute_import, print_function, unicode_literals
 
+import io
 import json
+import os
 import sys
+import tempfile
 import unittest
 
 import serial_json
@@ -29,6 +32,25 @@ class TestParsing(unittest.TestCase):
         for value in '1234 1.23 1e43 -1.2e43'.split():
             self.check(value)
 
+    def test_number_modes(self):
+        doc = '[12, -0, 9007199254740993, 1.5, -2e3, 1.25E-2]'
+        self.assertEqual(
+            [v for _, v in serial_json.loads(doc, number_mode='int_or_float')],
+            json.loads(doc))
+        self.assertEqual(
+            [type(v) for _, v in serial_json.loads(
+                doc, number_mode='int_or_float')],
+            [type(v) for v in json.loads(doc)])
+        from decimal import Decimal
+        self.assertEqual(
+            [v for _, v in serial_json.loads(doc, number_mode='decimal')],
+            json.loads(doc, parse_int=Decimal, parse_float=Decimal))
+        self.assertEqual(
+            [v for _, v in serial_json.loads(doc, number_mode='raw')],
+            ['12', '-0', '9007199254740993', '1.5', '-2e3', '1.25E-2'])
+        self.assertRaises(
+            ValueError, serial_json.loads, doc, number_mode='int')
+
     def test_arrays(self):
         result = list(serial_json.loads('[1, 2, [3, 4], 5]'))
         self.assertEqual(result, [
@@ -57,6 +79,20 @@ class TestParsing(unittest.TestCase):
     def test_escaped_unicode(self):
         self.check('"\\u04d2"')
 
+    def test_surrogate_pairs(self):
+        self.check('"\\ud834\\udd1e \\uD83D\\uDE00"')
+
+    def test_long_strings(self):
+        value = ('abc\\"\\\\\\/\\n\\u00e9\\ud834\\udd1e' * 50) + 'x' * 1000
+        doc = '{"%s": "%s"}' % (value, value)
+        expected = json.loads(doc)
+        for size in (1, 2, 3, 7, 11, 64):
+            result = list(serial_json.load(StringIO(doc), buffer_size=size))
+            # backslashes in keys are escaped in paths
+            key, = expected
+            self.assertEqual(result, [("$['{}']".format(
+                key.replace('\\', '\\\\')), expected[key])])
+
     def test_raw_unicode(self):
         self.check(u'"あ"')
 
@@ -82,5 +118,1387 @@ class TestParsing(unittest.TestCase):
                 '{"really_long_key": "really_long_value"}')
             list(serial_json.load(buf, buffer_size=i))
 
+    def test_buffer_boundaries(self):
+        doc = ('{"a": [-12.5e+3, 0.25, 17, true, false, null], '
+               '"b\\"c": {"d": "e\\u00e9"}, "f": [[], {}, [1e5]]}')
+        expected = list(serial_json.loads(doc, terminators=True))
+        for i in range(1, 12):
+            result = list(serial_json.load(
+                StringIO(doc), terminators=True, buffer_size=i))
+            self.assertEqual(result, expected)
+
+    def test_concatenated(self):
+        result = list(serial_json.loads('1 [2] {"a": 3}\n"4"'))
+        self.assertEqual(result, [
+            ('$', 1.0), ('$[0]', 2.0), ('$.a', 3.0), ('$', '4')])
+
+    def test_syntax_errors(self):
+        for value in ('[1 2]', '{"a" 1}', '{"a": 1,,}', '{1: 2}', '[1,]',
+                      '{"a": 1]', '[1}', ']', 'tru', 'nul ', '[1, x]', '[',
+                      '{"a": 1', '{"a"', '1 +'):
+            self.assertRaises(ValueError, list, serial_json.loads(value))
+
+class TestBatches(unittest.TestCase):
+    doc = '{"a": [1, 2, 3, {"b": "c"}], "d": [[4], [5]], "e": true}'
+
+    def test_next_batch(self):
+        expected = list(serial_json.loads(self.doc))
+        parser = serial_json.loads(self.doc)
+        batches = [parser.next_batch(3) for _ in range(4)]
+        self.assertEqual([len(batch) for batch in batches], [3, 3, 1, 0])
+        self.assertEqual(sum(batches, []), expected)
+
+    def test_reused_list(self):
+        expected = list(serial_json.loads(self.doc, buffer_size=4))
+        parser = serial_json.loads(self.doc, buffer_size=4)
+        out = []
+        result = []
+        for batch in parser.iter_batches(2, out):
+            self.assertTrue(batch is out)
+            self.assertTrue(0 < len(batch) <= 2)
+            result.extend(batch)
+        self.assertEqual(result, expected)
+
+    def test_next(self):
+        parser = serial_json.loads(self.doc)
+        self.assertEqual(next(parser), ('$.a[0]', 1.0))
+        self.assertEqual(parser.next(), ('$.a[1]', 2.0))
+        parser.reset()
+        self.assertEqual(next(parser), ('$.a[0]', 1.0))
+
+class TestLazyPaths(unittest.TestCase):
+    doc = '{"a": [1, {"b c": [true]}], "d": {"e": null}}'
+
+    def test_equal_to_strings(self):
+        expected = list(serial_json.loads(self.doc, terminators=True))
+        result = list(serial_json.loads(
+            self.doc, terminators=True, lazy_paths=True))
+        self.assertEqual(result, expected)
+        self.assertTrue(all(
+            isinstance(path, serial_json.Path) for path, _ in result))
+        self.assertEqual(
+            [str(path) for path, _ in result],
+            [path for path, _ in expected])
+
+    def test_parts(self):
+        expected = list(serial_json.loads(self.doc, list_paths=True))
+        result = list(serial_json.loads(self.doc, lazy_paths=True))
+        self.assertEqual(
+            [list(path.parts) for path, _ in result],
+            [path for path, _ in expected])
+        path = result[1][0]
+        self.assertEqual(len(path), 5)
+        self.assertEqual(path[-1], 0)
+        self.assertEqual(list(path), ['$', 'a', 1, 'b c', 0])
+
+    def test_shared_prefix(self):
+        result = list(serial_json.loads('[[1, 2]]', lazy_paths=True))
+        (first, _), (second, _) = result
+        self.assertTrue(first.parent is second.parent)
+        self.assertNotEqual(first, second)
+        self.assertEqual(hash(first), hash('$[0][0]'))
+
+    def test_pickle(self):
+        import pickle
+        path = next(serial_json.loads(self.doc, lazy_paths=True))[0]
+        self.assertEqual(pickle.loads(pickle.dumps(path)), path)
+
+class TestBinary(unittest.TestCase):
+    doc = u'{"あ": ["いう", "\\u00e9", 1.5], "key": "é€𝄞"}'
+
+    def parse(self, data, **kwargs):
+        return list(serial_json.load(io.BytesIO(data), **kwargs))
+
+    def test_bytes(self):
+        expected = list(serial_json.loads(self.doc))
+        self.assertEqual(self.parse(self.doc.encode('utf-8')), expected)
+
+    def test_split_characters(self):
+        expected = list(serial_json.loads(self.doc))
+        for size in range(1, 6):
+            self.assertEqual(self.parse(
+                self.doc.encode('utf-8'), buffer_size=size), expected)
+
+    def test_encoding(self):
+        expected = list(serial_json.loads(self.doc))
+        self.assertEqual(self.parse(
+            self.doc.encode('utf-16-le'), encoding='utf-16-le',
+            buffer_size=3), expected)
+
+    def test_truncated(self):
+        data = self.doc.encode('utf-8')[:-3]
+        self.assertRaises(ValueError, self.parse, data)
+
+    def test_rewind(self):
+        parser = serial_json.load(io.BytesIO(self.doc.encode('utf-8')))
+        first = list(parser)
+        parser.reset()
+        self.assertEqual(list(parser), first)
+
+class TestStringChunks(unittest.TestCase):
+    def chunks(self, doc, **kwargs):
+        return list(serial_json.loads(doc, max_string=4, **kwargs))
+
+    def test_short_strings(self):
+        self.assertEqual(self.chunks('["", "abcd", "a\\nc"]'), [
+            ('$[0]', ''), ('$[1]', 'abcd'), ('$[2]', 'a\nc')])
+
+    def test_chunks(self):
+        chunk, end = serial_json.StringChunk, serial_json.StringEnd()
+        expected = [
+            ('$.abcdefghij', chunk('abcd')),
+            ('$.abcdefghij', chunk('efgh')),
+            ('$.abcdefghij', chunk('ij')),
+            ('$.abcdefghij', end),
+            ('$.b', chunk('\n\n\n\n')),
+            ('$.b', chunk('\n')),
+            ('$.b', end),
+        ]
+        doc = '{"abcdefghij": "abcdefghij", "b": "\\n\\n\\n\\n\\n"}'
+        self.assertEqual(self.chunks(doc), expected)
+        for size in range(1, 10):
+            self.assertEqual(self.chunks(doc, buffer_size=size), expected)
+
+    def test_long_string(self):
+        value = ''.join(chr(ord('a') + i % 26) for i in range(1000))
+        result = list(serial_json.loads(
+            json.dumps([value]), max_string=64, buffer_size=100))
+        self.assertEqual(''.join(
+            event.value for _, event in result[:-1]), value)
+        self.assertEqual(
+            [len(event.value) for _, event in result[:-1]],
+            [64] * 15 + [40])
+
+class TestNumberBlocks(unittest.TestCase):
+    doc = '{"a": [1, 2.5, -3e2, 4], "b": [[5, 6], "x", 7, 8], "c": 9}'
+
+    def blocks(self, doc, **kwargs):
+        return [(path, (value.start, list(value.values))
+                 if isinstance(value, serial_json.NumberBlock) else value)
+                for path, value in serial_json.loads(doc, **kwargs)]
+
+    def test_blocks(self):
+        self.assertEqual(self.blocks(self.doc, number_blocks=3), [
+            ('$.a', (0, [1.0, 2.5, -300.0])),
+            ('$.a', (3, [4.0])),
+            ('$.b[0]', (0, [5.0, 6.0])),
+            ('$.b[1]', 'x'),
+            ('$.b', (2, [7.0, 8.0])),
+            ('$.c', 9.0),
+        ])
+
+    def test_buffer_boundaries(self):
+        values = [float(i) / 4 for i in range(200)]
+        doc = json.dumps({'samples': values, 'n': 1})
+        for size in (1, 2, 7, 64, 1000):
+            result = self.blocks(doc, number_blocks=50, buffer_size=size)
+            self.assertEqual(result[-1], ('$.n', 1.0))
+            self.assertEqual(
+                sum((block for _, (_, block) in result[:-1]), []), values)
+            starts = [start for _, (start, _) in result[:-1]]
+            self.assertEqual(starts, sorted(set(starts)))
+
+    def test_paths(self):
+        self.assertEqual(
+            self.blocks(self.doc, number_blocks=8, paths='$.a'),
+            [('$.a', (0, [1.0, 2.5, -300.0, 4.0]))])
+        # partly selected arrays are yielded per number
+        self.assertEqual(
+            self.blocks(self.doc, number_blocks=8, paths='$.a[1]'),
+            [('$.a[1]', 2.5)])
+
+    def test_errors(self):
+        self.assertRaises(ValueError, self.blocks, '[1, 2,]', number_blocks=8)
+        self.assertRaises(ValueError, self.blocks, '[1, 2.]', number_blocks=8)
+        self.assertRaises(
+            ValueError, serial_json.loads, '[]', number_blocks=8,
+            number_mode='raw')
+
+class TestFeed(unittest.TestCase):
+    doc = (
+        '{"a": [1, 2.5e3, true, null], "b\\"c": "x\\u00e9\\"yz", '
+        '"s": {"k": ["skip \\" me", {"q": 1}]}, "t": "\u00e9\u00e9"}')
+
+    def feed(self, chunks, **kwargs):
+        parser = serial_json.Parser(None, **kwargs)
+        events = []
+        for chunk in chunks:
+            events.extend(parser.feed(chunk))
+        return events + parser.close()
+
+    def test_splits(self):
+        for kwargs in ({}, {'paths': ['$.a', '$.t']}, {'max_string': 2},
+                       {'paths': '$.s', 'items': True}):
+            expected = list(serial_json.loads(self.doc, **kwargs))
+            for data in (self.doc, self.doc.encode('utf-8')):
+                for i in range(len(data) + 1):
+                    self.assertEqual(
+                        self.feed([data[:i], data[i:]], **kwargs), expected)
+                self.assertEqual(self.feed(
+                    [data[i:i + 1] for i in range(len(data))], **kwargs),
+                    expected)
+
+    def test_incremental(self):
+        parser = serial_json.Parser(None)
+        self.assertEqual(parser.feed('[1, 2'), [('$[0]', 1.0)])
+        self.assertEqual(parser.feed(''), [])
+        self.assertEqual(parser.feed('0, "ab'), [('$[1]', 20.0)])
+        self.assertEqual(parser.feed('c"]'), [('$[2]', 'abc')])
+        self.assertEqual(parser.close(), [])
+
+    def test_terminated_numbers(self):
+        # a number followed by a delimiter is not held back for more data
+        parser = serial_json.Parser(None, multi_document=True)
+        self.assertEqual(parser.feed('{"a": 1}\n'), [(0, '$.a', 1.0)])
+        self.assertEqual(parser.feed('{"b": 2.5e'), [])
+        self.assertEqual(parser.feed('1}'), [(1, '$.b', 25.0)])
+        self.assertEqual(parser.close(), [])
+        self.assertRaises(ValueError, parser.feed, '[]')
+
+    def test_errors(self):
+        parser = serial_json.Parser(None)
+        parser.feed('{"a": "b')
+        self.assertRaises(ValueError, parser.close)
+        parser = serial_json.Parser(None)
+        self.assertRaises(ValueError, parser.feed, '[1 2, 3, 4]')
+        self.assertRaises(
+            ValueError, serial_json.loads('[]').feed, '[]')
+
+    @unittest.skipIf(sys.version_info < (3, 6), 'requires asyncio')
+    def test_aload(self):
+        import asyncio
+        loop = asyncio.new_event_loop()
+        reader = asyncio.StreamReader(loop=loop)
+        reader.feed_data(self.doc.encode('utf-8'))
+        reader.feed_eof()
+        events = serial_json.aload(reader, chunk_size=7)
+        result = []
+        try:
+            while True:
+                result.append(loop.run_until_complete(events.__anext__()))
+        except StopAsyncIteration:  # pylint: disable=undefined-variable
+            pass
+        finally:
+            loop.close()
+        self.assertEqual(result, list(serial_json.loads(self.doc)))
+
+class TestMultiDocument(unittest.TestCase):
+    lines = ['{"a": 1, "b": [true]}', '"x"', '[]', '{"a": 2, "c": null}']
+
+    def test_documents(self):
+        doc = '\n'.join(self.lines)
+        expected = [
+            (0, '$.a', 1.0), (0, '$.b[0]', True), (1, '$', 'x'),
+            (3, '$.a', 2.0), (3, '$.c', None)]
+        self.assertEqual(
+            list(serial_json.loads(doc, multi_document=True)), expected)
+        for size in (1, 3):
+            self.assertEqual(list(serial_json.loads(
+                doc, multi_document=True, batch_size=size)), expected)
+        self.assertEqual(
+            list(serial_json.loads(doc, multi_document=True, paths='$.a')),
+            [(0, '$.a', 1.0), (3, '$.a', 2.0)])
+        parser = serial_json.Parser(None, multi_document=True)
+        events = [parser.feed(line + '\n') for line in self.lines]
+        self.assertEqual(sum(events, []) + parser.close(), expected)
+
+    def test_parallel_load(self):
+        import os
+        import tempfile
+        handle, filename = tempfile.mkstemp()
+        try:
+            with os.fdopen(handle, 'w') as fp:
+                for i in range(500):
+                    fp.write(self.lines[i % 4] + '\n')
+            with open(filename, 'rb') as fp:
+                expected = list(serial_json.load(fp, multi_document=True))
+            self.assertEqual(list(serial_json.parallel_load(
+                filename, workers=2, chunk_size=1000)), expected)
+        finally:
+            os.remove(filename)
+
+class TestParallelArray(unittest.TestCase):
+    def parse(self, doc, **kwargs):
+        import os
+        import tempfile
+        handle, filename = tempfile.mkstemp()
+        try:
+            with os.fdopen(handle, 'wb') as fp:
+                fp.write(doc.encode('utf-8'))
+            return list(serial_json.parallel_array(
+                filename, workers=2, chunk_size=50, **kwargs))
+        finally:
+            os.remove(filename)
+
+    def test_parallel_array(self):
+        doc = json.dumps([
+            {'a': i, 'b': ['x, ]', {'c': [i, '\u00e9"']}], 'd': {}}
+            for i in range(40)])
+        for kwargs in ({}, {'terminators': True}, {'paths': '$[*].b[1]'},
+                       {'paths': '$[*]', 'items': True}, {'lazy_paths': True},
+                       {'paths': '$[2,30]', 'items': True}):
+            self.assertEqual(self.parse(doc, **kwargs),
+                             list(serial_json.loads(doc, **kwargs)))
+
+    def test_short_arrays(self):
+        for doc in (' []', '[1]', '[[]] ', '["a", 2]'):
+            self.assertEqual(self.parse(doc, terminators=True),
+                             list(serial_json.loads(doc, terminators=True)))
+
+    def test_errors(self):
+        for doc in ('', '{}', '[1, 2,]', '[1, 2', '[1] 2', '["a]', '[1 2]'):
+            self.assertRaises(ValueError, self.parse, doc)
+
+class TestIndex(unittest.TestCase):
+    doc = json.dumps({
+        'regions': {
+            'emea': {'uk': [1, 2, {'x': 'y'}], 'fr': None,
+                     "it's": [4], 'back\\slash': {'z': 5}},
+            'a"b': ['\u00e9', [3]],
+        },
+        'list': [{'k': [True, {}]}, 5, []],
+        'n': 1,
+    }, indent=1)
+
+    def seek(self, path, **kwargs):
+        fp = io.BytesIO(self.doc.encode('utf-8'))
+        index = serial_json.build_index(fp, depth=2)
+        return list(serial_json.load(fp, **kwargs).seek_path(path, index))
+
+    def test_seek_path(self):
+        for path in ('$', '$.regions', '$.regions.emea', "$.regions['a\"b']",
+                     '$.list[0]', '$.list[2]', '$.n', '$.regions.emea.uk',
+                     '$.regions.emea.uk[2].x', '$.list[0].k[1]'):
+            for kwargs in ({}, {'terminators': True}, {'lazy_paths': True},
+                           {'items': True}):
+                self.assertEqual(
+                    self.seek(path, **kwargs),
+                    list(serial_json.loads(self.doc, paths=path, **kwargs)))
+        # keys deeper than the index which need quoting and escaping
+        for key, expected in (("it's", [4.0]), ('back\\slash', [5.0])):
+            quoted = key.replace('\\', '\\\\').replace("'", "\\'")
+            for path in ("$.regions.emea['{}']".format(quoted),
+                         ['$', 'regions', 'emea', key]):
+                self.assertEqual(
+                    [value for _, value in self.seek(path)], expected)
+        self.assertRaises(KeyError, self.seek, '$.regions.apac')
+        self.assertRaises(KeyError, self.seek, '$.list[3]')
+
+    def test_index(self):
+        data = self.doc.encode('utf-8')
+        index = serial_json.build_index(io.BytesIO(data), depth=1)
+        self.assertEqual(len(index), 3)
+        start, end, parts = index.find('$.list')
+        self.assertEqual(parts, ('$', 'list'))
+        self.assertEqual(json.loads(data[start:end].decode('utf-8')),
+                         json.loads(self.doc)['list'])
+
+    def test_sidecar(self):
+        import os
+        import tempfile
+        handle, filename = tempfile.mkstemp()
+        try:
+            with os.fdopen(handle, 'wb') as fp:
+                fp.write(self.doc.encode('utf-8'))
+            with open(filename, 'rb') as fp:
+                serial_json.build_index(fp)
+            with open(filename, 'rb') as fp:
+                parser = serial_json.load(fp)
+                self.assertEqual(
+                    list(parser.seek_path('$.regions.emea.uk')),
+                    [('$.regions.emea.uk[0]', 1.0),
+                     ('$.regions.emea.uk[1]', 2.0),
+                     ('$.regions.emea.uk[2].x', 'y')])
+                self.assertEqual(list(parser.seek_path(['$', 'n'])),
+                                 [('$.n', 1.0)])
+                parser.reset()
+                self.assertEqual(list(parser), list(serial_json.loads(
+                    self.doc)))
+            # text file positions are not the indexed byte offsets
+            with io.open(filename, encoding='utf-8') as fp:
+                self.assertRaises(ValueError, serial_json.load(fp).seek_path,
+                                  "$.regions['a\"b']")
+            self.assertRaises(ValueError, serial_json.load(
+                io.StringIO(self.doc)).seek_path, '$.n',
+                serial_json.build_index(io.BytesIO(self.doc.encode('utf-8'))))
+            # the file has changed since it was indexed
+            with open(filename, 'ab') as fp:
+                fp.write(b'\n')
+            with open(filename, 'rb') as fp:
+                self.assertRaises(ValueError,
+                                  serial_json.load(fp).seek_path, '$.n')
+        finally:
+            os.remove(filename)
+            os.remove(filename + '.idx')
+
+class TestCheckpoint(unittest.TestCase):
+    doc = json.dumps({
+        'a': [1, 2.5, {'b': 'caf\u00e9 \u00e9\u00e9', 'c': [None, True]}],
+        'd\u00e9': 'long string with \u00e9scapes\n' * 3,
+        'e': [[1, 2], {'f': 'g'}, []],
+    }, ensure_ascii=False)
+
+    def check(self, data, **kwargs):
+        expected = list(serial_json.load(io.BytesIO(data), **kwargs))
+        for count in range(len(expected) + 1):
+            parser = serial_json.load(io.BytesIO(data), **kwargs)
+            events = parser.__iter__()
+            for _ in range(count):
+                next(events)
+            state = json.loads(json.dumps(parser.checkpoint()))
+            resumed = serial_json.Parser.resume(
+                io.BytesIO(data), state, **kwargs)
+            self.assertEqual(list(resumed), expected[count:])
+
+    def test_resume(self):
+        data = self.doc.encode('utf-8')
+        for kwargs in ({}, {'batch_size': 3}, {'max_string': 5},
+                       {'paths': ['$.a[2]', '$.e[*]']}):
+            for size in (1, 4, 1024):
+                self.check(data, buffer_size=size, **kwargs)
+
+    def test_resume_items(self):
+        data = self.doc.encode('utf-8')
+        self.check(data, paths='$.e[*]', items=True, batch_size=1,
+                   buffer_size=3)
+        self.check(data, paths='$.a', items=True, buffer_size=2)
+        # batches that start with an item partly built
+        for size in (3, 7):
+            self.check(data, paths='$.e[*]', items=True, buffer_size=size)
+            self.check(data, paths='$.*', items=True, buffer_size=size)
+        nested = json.dumps([{'a': {'b': [1, {'c': 'x' * 9}], 'd': i}}
+                             for i in range(4)]).encode('utf-8')
+        self.check(nested, paths='$[*]', items=True, buffer_size=5)
+
+    def test_resume_documents(self):
+        data = b'{"a": 1}\n[2, 3]\n"\xc3\xa9"\n4'
+        self.check(data, multi_document=True, batch_size=2, buffer_size=3)
+
+    def test_text(self):
+        # character offsets, before which there are non-ASCII characters
+        self.check_text(io.StringIO(self.doc))
+        handle, filename = tempfile.mkstemp()
+        self.addCleanup(os.remove, filename)
+        with os.fdopen(handle, 'wb') as fp:
+            fp.write(self.doc.encode('utf-8'))
+        with io.open(filename, encoding='utf-8') as fp:
+            parser = serial_json.load(fp, batch_size=1)
+            next(parser)
+            with self.assertRaises(ValueError):
+                parser.checkpoint()
+            state = serial_json.load(io.BytesIO(
+                self.doc.encode('utf-8'))).checkpoint()
+            with self.assertRaises(ValueError):
+                serial_json.Parser.resume(fp, state)
+
+    def test_number_blocks(self):
+        # blocks end with the buffers, which would be read from another
+        # offset when resuming
+        data = json.dumps({'a': [i + 1.5 for i in range(7)]}).encode('utf-8')
+        parser = serial_json.load(io.BytesIO(data), number_blocks=3,
+                                  buffer_size=8, batch_size=1)
+        events = parser.__iter__()
+        for _ in range(2):
+            next(events)
+        self.assertRaises(ValueError, parser.checkpoint)
+
+    def check_text(self, fp):
+        expected = list(serial_json.loads(self.doc))
+        for count in range(len(expected) + 1):
+            fp.seek(0)
+            parser = serial_json.load(fp, batch_size=2, buffer_size=4)
+            events = parser.__iter__()
+            for _ in range(count):
+                next(events)
+            state = parser.checkpoint()
+            resumed = serial_json.Parser.resume(
+                io.StringIO(self.doc), state, buffer_size=4)
+            self.assertEqual(list(resumed), expected[count:])
+
+    def test_offset(self):
+        data = self.doc.encode('utf-8')
+        parser = serial_json.load(io.BytesIO(data), batch_size=1)
+        for path, _ in parser:
+            if path == '$.a[2].c[0]':
+                break
+        state = parser.checkpoint()
+        self.assertTrue(data[state['offset']:].startswith(b', true]'))
+
+class TestMmap(unittest.TestCase):
+    doc = json.dumps({
+        'a': [1, -2.5e3, {'b': 'caf\u00e9 "\\u00e9" \\ud834\\udd1e'}],
+        'k\u00e9y': ['long string ' * 4, [True, False, None], {}],
+        'n': [0.5, 1, 2, 3],
+    }, ensure_ascii=False).replace('\\\\u', '\\u')
+
+    def setUp(self):
+        import tempfile
+        handle, self.filename = tempfile.mkstemp()
+        with io.open(handle, 'wb') as fp:
+            fp.write(self.doc.encode('utf-8'))
+
+    def tearDown(self):
+        import os
+        os.remove(self.filename)
+
+    def test_load_path(self):
+        for kwargs in ({}, {'terminators': True}, {'paths': ['$.a', '$.n']},
+                       {'max_string': 5}, {'paths': '$.*[*]', 'items': True},
+                       {'number_mode': 'decimal'}, {'number_mode': 'raw'},
+                       {'number_blocks': 2}, {'lazy_paths': True}):
+            expected = list(serial_json.loads(self.doc, **kwargs))
+            with serial_json.load_path(self.filename, **kwargs) as parser:
+                self.assertEqual(list(parser), expected)
+            self.assertEqual(list(serial_json.load(
+                io.BytesIO(self.doc.encode('utf-8')), mmap=True, **kwargs)),
+                expected)
+
+    def test_long_strings(self):
+        # read in windows, which end within multi-byte characters
+        doc = json.dumps(['\u00e9\u20ac\U0001d11e\\"x' * 50, 'short'],
+                         ensure_ascii=False).encode('utf-8')
+        for max_string in (1, 3, 64):
+            for buffer_size in (1, 5):
+                kwargs = dict(max_string=max_string, buffer_size=buffer_size)
+                self.assertEqual(
+                    list(serial_json.load(io.BytesIO(doc), mmap=True,
+                                          **kwargs)),
+                    list(serial_json.load(io.BytesIO(doc), **kwargs)))
+
+    def test_long_string_memory(self):
+        try:
+            import tracemalloc
+        except ImportError:
+            self.skipTest('requires tracemalloc')
+        with io.open(self.filename, 'wb') as fp:
+            fp.write(b'["' + b'x' * (8 * 1024 * 1024) + b'"]')
+        tracemalloc.start()
+        try:
+            with serial_json.load_path(
+                    self.filename, max_string=64 * 1024) as parser:
+                for path, value in parser:
+                    pass
+            peak = tracemalloc.get_traced_memory()[1]
+        finally:
+            tracemalloc.stop()
+        self.assertEqual(value, serial_json.StringEnd())
+        self.assertLess(peak, 1024 * 1024)
+
+    def test_seek_path_memory(self):
+        try:
+            import tracemalloc
+        except ImportError:
+            self.skipTest('requires tracemalloc')
+        with io.open(self.filename, 'wb') as fp:
+            fp.write(b'{"big": ["' + b'x' * (8 * 1024 * 1024) + b'"],'
+                     b' "n": 1}')
+        with open(self.filename, 'rb') as fp:
+            index = serial_json.build_index(fp, filename=os.devnull)
+        tracemalloc.start()
+        try:
+            # the range of the value is viewed in place, not copied
+            with serial_json.load_path(
+                    self.filename, max_string=64 * 1024) as parser:
+                for path, value in parser.seek_path('$.big', index):
+                    pass
+            peak = tracemalloc.get_traced_memory()[1]
+        finally:
+            tracemalloc.stop()
+        self.assertEqual(value, serial_json.StringEnd())
+        self.assertLess(peak, 1024 * 1024)
+
+    def test_positions(self):
+        expected = list(serial_json.loads(self.doc))
+        index = serial_json.build_index(io.BytesIO(self.doc.encode('utf-8')))
+        parser = serial_json.load_path(self.filename, batch_size=2)
+        self.assertEqual(list(parser.seek_path("$['k\u00e9y'][1]", index)),
+                         expected[4:7])
+        parser.reset()
+        events = parser.__iter__()
+        for _ in range(3):
+            next(events)
+        state = parser.checkpoint()
+        with open(self.filename, 'rb') as fp:
+            resumed = serial_json.Parser.resume(fp, state, mmap=True)
+            self.assertEqual(list(resumed), expected[3:])
+        parser.release()
+
+    def test_release(self):
+        parser = serial_json.load_path(self.filename)
+        next(iter(parser))
+        parser.release()
+        self.assertTrue(parser.reader.closed)
+        self.assertTrue(parser._map.closed)
+        self.assertRaises(ValueError, list, parser)
+        # the file object was not opened by the parser
+        with open(self.filename, 'rb') as fp:
+            parser = serial_json.load(fp, mmap=True)
+            with parser:
+                next(iter(parser))
+            self.assertFalse(fp.closed)
+            self.assertTrue(parser._map.closed)
+
+    def test_errors(self):
+        self.assertRaises(
+            ValueError, serial_json.load_path, self.filename,
+            encoding='utf-16')
+        for doc in (b'{"a": "b', b'{"a": 1,}', b'["\\', b'[1] x'):
+            self.assertRaises(ValueError, list, serial_json.load(
+                io.BytesIO(doc), mmap=True))
+        # messages show the text of the token, as when reading text
+        for doc, message in ((b'{"a": 1]', "Unexpected character ']'"),
+                             (b'[1 2]', "Expected ',' ('2')"),
+                             (b'[1, :]', "Unexpected character ':'")):
+            with self.assertRaises(ValueError) as context:
+                list(serial_json.load(io.BytesIO(doc), mmap=True))
+            self.assertIn(message, str(context.exception))
+
+class TestReadAhead(unittest.TestCase):
+    doc = json.dumps({
+        'a': [1, 2.5, {'b': 'caf\u00e9', 'c': [None, True]}],
+        'd': ['x' * 100] * 50,
+    }, ensure_ascii=False).encode('utf-8')
+
+    def compressed(self):
+        import bz2
+        import gzip
+        out = io.BytesIO()
+        with gzip.GzipFile(fileobj=out, mode='wb') as fp:
+            fp.write(self.doc)
+        yield 'gzip', out.getvalue()
+        yield 'bz2', bz2.compress(self.doc)
+        try:
+            import lzma
+        except ImportError:
+            return
+        yield 'xz', lzma.compress(self.doc)
+
+    def test_decompress(self):
+        expected = list(serial_json.load(io.BytesIO(self.doc)))
+        for compression, data in self.compressed():
+            self.assertEqual(serial_json.detect_compression(io.BytesIO(data)),
+                             compression)
+            for read_ahead, size in ((1, 7), (2, 64), (4, 64 * 1024)):
+                parser = serial_json.load(
+                    io.BytesIO(data), read_ahead=read_ahead, buffer_size=size)
+                self.assertEqual(list(parser), expected)
+                parser.reset()
+                self.assertEqual(list(parser), expected)
+        self.assertIsNone(
+            serial_json.detect_compression(io.BytesIO(self.doc)))
+        self.assertEqual(list(serial_json.load(
+            io.BytesIO(self.doc), read_ahead=2, buffer_size=16)), expected)
+
+    def test_concatenated(self):
+        import gzip
+        out = io.BytesIO()
+        for doc in (b'{"a": 1}\n', b'[2, 3]\n'):
+            with gzip.GzipFile(fileobj=out, mode='wb') as fp:
+                fp.write(doc)
+        out.seek(0)
+        self.assertEqual(list(serial_json.load(
+            out, read_ahead=1, multi_document=True)),
+            [(0, '$.a', 1), (1, '$[0]', 2), (1, '$[1]', 3)])
+
+    def test_member_boundaries(self):
+        # streams that end exactly at the end of a read
+        docs = [b'{"a": 1}\n', b'[2, 3]\n', b'"x"\n']
+        for compression, _ in self.compressed():
+            members = [self.compress(compression, doc) for doc in docs]
+            for size in (len(members[0]), len(members[0]) + len(members[1]),
+                         1, 1000):
+                reader = serial_json.open_input(
+                    io.BytesIO(b''.join(members)), chunk_size=size)
+                self.assertEqual(reader.read(), b''.join(docs))
+
+    def compress(self, compression, data):
+        import bz2
+        import gzip
+        if compression == 'gzip':
+            out = io.BytesIO()
+            with gzip.GzipFile(fileobj=out, mode='wb') as fp:
+                fp.write(data)
+            return out.getvalue()
+        elif compression == 'bz2':
+            return bz2.compress(data)
+        import lzma
+        return lzma.compress(data)
+
+    def test_bounded_chunks(self):
+        # the output of highly compressed input is split into chunks
+        for compression, _ in self.compressed():
+            data = self.compress(compression, b' ' * (4 * 1024 * 1024))
+            reader = serial_json.open_input(io.BytesIO(data), chunk_size=4096)
+            sizes = set()
+            while True:
+                chunk = reader.read(1024 * 1024)
+                if not chunk:
+                    break
+                sizes.add(len(chunk))
+            if compression == 'bz2' and sys.version_info[0] == 2:
+                # Python 2's bz2 decompresses without a limit
+                continue
+            self.assertEqual(max(sizes), 4096)
+            self.assertEqual(reader.tell(), 4 * 1024 * 1024)
+
+    def test_seek(self):
+        data = next(self.compressed())[1]
+        reader = serial_json.open_input(io.BytesIO(data), chunk_size=10)
+        self.assertEqual(reader.read(), self.doc)
+        self.assertEqual(reader.seek(5), 5)
+        self.assertEqual(reader.read(3), self.doc[5:8])
+        self.assertEqual(reader.seek(200), 200)
+        self.assertEqual(reader.read(3), self.doc[200:203])
+        reader.close()
+        # checkpoints hold positions in the decompressed data
+        expected = list(serial_json.load(io.BytesIO(self.doc)))
+        parser = serial_json.load(io.BytesIO(data), read_ahead=2)
+        events = parser.__iter__()
+        for _ in range(4):
+            next(events)
+        resumed = serial_json.Parser.resume(
+            io.BytesIO(data), parser.checkpoint(), read_ahead=2)
+        self.assertEqual(list(resumed), expected[4:])
+
+    def test_load_path(self):
+        import os
+        import tempfile
+        data = next(self.compressed())[1]
+        handle, filename = tempfile.mkstemp()
+        with io.open(handle, 'wb') as fp:
+            fp.write(data)
+        try:
+            expected = list(serial_json.load(io.BytesIO(self.doc)))
+            with serial_json.load_path(filename) as parser:
+                self.assertEqual(list(parser), expected)
+                thread = parser.reader._thread
+            self.assertTrue(parser.reader.fp.closed)
+            self.assertTrue(thread is None or not thread.is_alive())
+        finally:
+            os.remove(filename)
+
+    def test_release(self):
+        data = next(self.compressed())[1]
+        fp = io.BytesIO(data)
+        parser = serial_json.load(fp, read_ahead=1, buffer_size=16)
+        next(iter(parser))
+        thread = parser.reader._thread
+        self.assertTrue(thread.is_alive())
+        parser.release()
+        self.assertFalse(thread.is_alive())
+        # the file object was not opened by the parser
+        self.assertFalse(fp.closed)
+
+    def test_abandoned(self):
+        import gc
+        data = self.compress('gzip', b'[' + b'1, ' * 100000 + b'1]')
+        parser = serial_json.load(io.BytesIO(data), read_ahead=1,
+                                  buffer_size=16)
+        next(iter(parser))
+        thread = parser.reader._thread
+        self.assertTrue(thread.is_alive())
+        del parser
+        gc.collect()
+        thread.join(5)
+        self.assertFalse(thread.is_alive())
+
+    def test_errors(self):
+        for _, data in self.compressed():
+            self.assertRaises(ValueError, list, serial_json.load(
+                io.BytesIO(data[:len(data) // 2]), read_ahead=2))
+            self.assertRaises(ValueError, list, serial_json.load(
+                io.BytesIO(data[:20] + b'x' * 40), read_ahead=2))
+
+class TestWriter(unittest.TestCase):
+    doc = {
+        'a': [1, 2.5, {'b': 'caf\u00e9 "q"', "it's": [None, True, []]}],
+        'e': {}, 'x y': [[], [1e300, -0.5]], "k'l": {"m']n": False},
+        'xa\n': [0],
+    }
+
+    def write(self, events, **kwargs):
+        out = io.StringIO()
+        serial_json.Writer(out, **kwargs).write_all(events)
+        return out.getvalue()
+
+    def test_round_trip(self):
+        text = json.dumps(self.doc)
+        for kwargs in ({}, {'list_paths': True}, {'lazy_paths': True},
+                       {'max_string': 2}, {'number_blocks': 2},
+                       {'number_mode': 'decimal'}):
+            events = serial_json.loads(text, terminators=True, **kwargs)
+            self.assertEqual(json.loads(self.write(events)), self.doc)
+        self.assertEqual(self.write(serial_json.loads(
+            text, terminators=True, number_mode='int_or_float')), text)
+        # a key ending with a newline is quoted
+        self.assertEqual(serial_json.render_part('xa\n'), "['xa\n']")
+
+    def test_inferred(self):
+        # without terminators, empty collections are lost
+        text = json.dumps(self.doc)
+        for kwargs in ({}, {'list_paths': True}):
+            self.assertEqual(json.loads(self.write(
+                serial_json.loads(text, **kwargs))), {
+                    'a': [1, 2.5, {'b': self.doc['a'][2]['b'],
+                                   "it's": [None, True]}],
+                    'x y': [[1e300, -0.5]], "k'l": {"m']n": False},
+                    'xa\n': [0]})
+        events = [('$.a.b', 1), ('$.a.c[0]', 2), ('$.a.c[3]', 3),
+                  (['$', 'd'], 'x')]
+        self.assertEqual(self.write(events, separators=(',', ':')),
+                         '{"a":{"b":1,"c":[2,3]},"d":"x"}')
+
+    def test_quoted_keys(self):
+        # keys which look like the end of a segment in a jsonpath
+        doc = {'x': {"y']['z": 3, "a'].b": {'\\': [1]}}, "'": 2}
+        text = json.dumps(doc)
+        for terminators in (True, False):
+            self.assertEqual(json.loads(self.write(serial_json.loads(
+                text, terminators=terminators))), doc)
+
+    def test_transform(self):
+        data = (b'{"users": [{"name": "a", "pw": "x"},'
+                b' {"name": "b", "pw": "y"}]}')
+        def redact(events):
+            for path, value in events:
+                if not path.endswith('.pw'):
+                    yield path, value
+        out = io.BytesIO()
+        serial_json.Writer(out, buffer_size=4).write_all(
+            redact(serial_json.load(io.BytesIO(data), terminators=True)))
+        self.assertEqual(json.loads(out.getvalue().decode('utf-8')),
+                         {'users': [{'name': 'a'}, {'name': 'b'}]})
+
+    def test_documents(self):
+        data = b'{"a": 1}\n[2, "\xc3\xa9"]\n3\n[]'
+        for terminators in (True, False):
+            out = io.BytesIO()
+            serial_json.Writer(out, ensure_ascii=False).write_all(
+                serial_json.load(io.BytesIO(data), multi_document=True,
+                                 terminators=terminators,
+                                 number_mode='int_or_float'))
+            expected = b'{"a": 1}\n[2, "\xc3\xa9"]\n3'
+            if terminators:
+                expected += b'\n[]'
+            self.assertEqual(out.getvalue(), expected)
+
+    def test_errors(self):
+        writer = serial_json.Writer(io.StringIO())
+        writer.write('$', serial_json.StartArray())
+        self.assertRaises(ValueError, writer.write, '$.a', 1)
+        self.assertRaises(
+            ValueError, writer.write, '$', serial_json.EndObject())
+        writer.write('$[0]', serial_json.StringChunk('ab'))
+        self.assertRaises(ValueError, writer.write, '$[1]', 1)
+        self.assertRaises(ValueError, writer.close)
+        self.assertRaises(
+            ValueError, serial_json.Writer(io.StringIO()).write, 'a.b', 1)
+
+class TestHybrid(unittest.TestCase):
+    doc = json.dumps([
+        {'a': 1, 'b': [2.5, 'caf\u00e9', None], 'c': {}, 'd': []},
+        {'a': 2, 'b': ['x' * 40, True, {'e': -3e-2}]},
+        [[[[1]]], {"it's": 'y'}],
+    ] * 5, ensure_ascii=False)
+
+    def test_equal(self):
+        for kwargs in ({}, {'terminators': True}, {'list_paths': True},
+                       {'paths': ['$[*].b', '$..e']}, {'max_string': 16},
+                       {'paths': '$[*]', 'items': True},
+                       {'paths': '$[*].b[*]', 'items': True},
+                       {'number_mode': 'int_or_float'}):
+            for size, mmap in ((16, False), (100, False), (100, True)):
+                expected = list(serial_json.load(io.BytesIO(
+                    self.doc.encode('utf-8')), buffer_size=size, **kwargs))
+                for hybrid in (10, 64, 4096):
+                    self.assertEqual(list(serial_json.load(
+                        io.BytesIO(self.doc.encode('utf-8')),
+                        buffer_size=size, mmap=mmap, hybrid=hybrid,
+                        **kwargs)), expected)
+
+    def test_fallback(self):
+        # duplicate keys, and what only the scanner accepts or rejects
+        for doc in ('{"a": 1, "a": [2], "a": 3}', '["a\tb", 01]',
+                    '[' * 1500 + ']' * 1500):
+            self.assertEqual(list(serial_json.loads(doc, hybrid=4096)),
+                             list(serial_json.loads(doc)))
+        for doc in ('[NaN]', '[1, {"a": Infinity}]', '[1,]'):
+            self.assertRaises(ValueError, list,
+                              serial_json.loads(doc, hybrid=4096))
+
+    def test_feed(self):
+        expected = list(serial_json.loads(self.doc, terminators=True))
+        parser = serial_json.Parser(None, hybrid=64, terminators=True)
+        events = []
+        for start in range(0, len(self.doc), 37):
+            events.extend(parser.feed(self.doc[start:start + 37]))
+        self.assertEqual(events + parser.close(), expected)
+
+class TestStats(unittest.TestCase):
+    doc = json.dumps({
+        'a': [[[1, 2.5]], 'caf\u00e9'], 'b': 'x' * 50, 'c': [None, True, {}],
+    }).encode('utf-8')
+
+    def test_counters(self):
+        parser = serial_json.load(io.BytesIO(self.doc), buffer_size=16)
+        events = list(parser)
+        stats = parser.stats()
+        self.assertEqual(stats['bytes_read'], len(self.doc))
+        self.assertEqual(stats['fill_calls'], len(self.doc) // 16 + 2)
+        self.assertEqual(stats['events'], len(events))
+        self.assertEqual(stats['max_depth'], 4)
+        self.assertEqual(stats['position'], len(self.doc))
+        self.assertIsNone(stats['size'])
+        self.assertNotIn('events_by_type', stats)
+        parser.reset()
+        self.assertEqual(parser.stats()['events'], 0)
+
+    def test_events(self):
+        for kwargs, strings in (({}, {'str': 2}),
+                                ({'max_string': 20},
+                                 {'str': 1, 'StringChunk': 3,
+                                  'StringEnd': 1})):
+            parser = serial_json.load(io.BytesIO(self.doc), stats=True,
+                                      terminators=True, **kwargs)
+            list(parser)
+            stats = parser.stats()
+            expected = {'float': 2, 'NoneType': 1, 'bool': 1,
+                        'StartObject': 2, 'EndObject': 2, 'StartArray': 4,
+                        'EndArray': 4}
+            expected.update(strings)
+            self.assertEqual(stats['events_by_type'], expected)
+            self.assertEqual(stats['largest_string'], 50)
+
+    def test_progress(self):
+        import os
+        import tempfile
+        handle, filename = tempfile.mkstemp()
+        with io.open(handle, 'wb') as fp:
+            fp.write(self.doc)
+        reports = []
+        try:
+            with open(filename, 'rb') as fp:
+                list(serial_json.load(fp, progress=reports.append,
+                                      progress_interval=0, batch_size=2))
+        finally:
+            os.remove(filename)
+        self.assertTrue(len(reports) > 2)
+        self.assertEqual(reports[-1]['size'], len(self.doc))
+        self.assertEqual(reports[-1]['position'], len(self.doc))
+        self.assertEqual(reports[-1]['events_by_type']['float'], 2)
+        positions = [report['position'] for report in reports]
+        self.assertEqual(positions, sorted(positions))
+
+    def test_resume(self):
+        parser = serial_json.load(io.BytesIO(self.doc), batch_size=2)
+        events = parser.__iter__()
+        for _ in range(3):
+            next(events)
+        resumed = serial_json.Parser.resume(
+            io.BytesIO(self.doc), parser.checkpoint(), stats=True)
+        self.assertEqual(len(list(resumed)), resumed.stats()['events'])
+        self.assertEqual(resumed.stats()['events'], 3)
+
+    def test_mmap(self):
+        # a mapped file is one buffer, but only what was scanned is counted
+        parser = serial_json.load(io.BytesIO(self.doc), mmap=True,
+                                  batch_size=2)
+        events = parser.__iter__()
+        next(events)
+        stats = parser.stats()
+        self.assertEqual(stats['bytes_read'], stats['position'])
+        self.assertLess(stats['bytes_read'], len(self.doc) // 2)
+        list(events)
+        self.assertEqual(parser.stats()['bytes_read'], len(self.doc))
+
+class TestBenchmarks(unittest.TestCase):
+    def test_corpora(self):
+        from .benchmarks.corpus import CORPORA, generate
+        for kind in CORPORA:
+            out = io.BytesIO()
+            size = generate(kind, 20000, out)
+            data = out.getvalue()
+            self.assertEqual(size, len(data))
+            self.assertTrue(20000 <= size < 40000)
+            again = io.BytesIO()
+            generate(kind, 20000, again)
+            self.assertEqual(again.getvalue(), data)
+            text = data.decode('utf-8')
+            if kind == 'ndjson':
+                expected = [json.loads(line) for line in text.splitlines()]
+                self.assertEqual(list(serial_json.items(
+                    io.BytesIO(data), '$', multi_document=True,
+                    number_mode='int_or_float')), expected)
+            else:
+                self.assertEqual(list(serial_json.items(
+                    io.BytesIO(data), '$', number_mode='int_or_float')),
+                    [json.loads(text)])
+
+    def test_compare(self):
+        from .benchmarks.__main__ import compare
+        baseline = [
+            {'corpus': 'numbers', 'size_mb': 1, 'case': 'load',
+             'mb_per_second': 10.0, 'peak_rss_kb': 1000},
+            {'corpus': 'numbers', 'size_mb': 1, 'case': 'json',
+             'mb_per_second': 100.0, 'peak_rss_kb': 1000},
+        ]
+        results = [dict(baseline[0], mb_per_second=8.5, peak_rss_kb=1100),
+                   dict(baseline[1], mb_per_second=70.0, peak_rss_kb=1300),
+                   dict(baseline[1], size_mb=10, mb_per_second=1.0)]
+        regressions = compare(results, baseline, tolerance=0.2)
+        self.assertEqual(len(regressions), 2)
+        self.assertTrue(regressions[0].startswith('numbers 1 MB json'))
+        self.assertFalse(compare(results[:1], baseline))
+
+    def test_cases(self):
+        from .benchmarks.cases import CASES, run_case
+        from .benchmarks.corpus import generate
+        directory = tempfile.mkdtemp()
+        filename = os.path.join(directory, 'numbers.json')
+        try:
+            with open(filename, 'wb') as fp:
+                generate('numbers', 20000, fp)
+            results = dict((case, run_case(case, filename))
+                           for case in CASES)
+        finally:
+            for name in os.listdir(directory):
+                os.remove(os.path.join(directory, name))
+            os.rmdir(directory)
+        events = results['load']['events']
+        self.assertTrue(events > 0)
+        for case in ('loads', 'lazy_paths', 'hybrid', 'mmap', 'max_string',
+                     'list_paths', 'stats', 'int_or_float', 'decimal', 'raw',
+                     'gzip', 'gzip_read_ahead'):
+            self.assertEqual(results[case]['events'], events)
+        self.assertIsNone(results['json']['events'])
+
+class TestMemory(unittest.TestCase):
+    def setUp(self):
+        try:
+            import tracemalloc  # noqa: F401
+        except ImportError:
+            self.skipTest('requires tracemalloc')
+        from .benchmarks.memory import measure
+        self.measure = measure
+
+    def assertGrowth(self, shape, small, large, factor, **kwargs):
+        peaks = [self.measure(shape, size, **kwargs)['peak']
+                 for size in (small, large)]
+        # allow for allocations that do not depend on the document
+        self.assertLessEqual(peaks[1], peaks[0] * factor + 64 * 1024, peaks)
+
+    def test_length(self):
+        for kwargs in ({}, {'list_paths': True}, {'lazy_paths': True},
+                       {'terminators': True}):
+            self.assertGrowth('length', 2000, 8000, 1.25, batch_size=256,
+                              **kwargs)
+
+    def test_width(self):
+        self.assertGrowth('width', 5000, 20000, 1.5)
+
+    def test_depth(self):
+        self.assertGrowth('depth', 1000, 4000, 4.5, lazy_paths=True)
+        # string paths repeat each ancestor's path
+        self.assertGrowth('depth', 500, 1000, 4.5)
+
+    def test_string(self):
+        self.assertGrowth('string', 100000, 1000000, 1.25, max_string=1024)
+
+    def test_report(self):
+        result = self.measure('depth', 1000)
+        self.assertEqual(result['events'], 1)
+        size, location, source = result['top'][0]
+        # the paths of the enclosing collections
+        self.assertTrue(location.startswith('serial_json.py:'), location)
+        self.assertIn('prefix', source)
+        self.assertGreater(size, result['peak'] // 8)
+
+class TestTee(unittest.TestCase):
+    doc = '''{"records": [{"id": 1, "name": "a", "tags": ["x"]},
+                           {"id": 2, "name": "b", "tags": []}],
+               "meta": {"count": 2, "name": "m"}}'''
+
+    def assertTee(self, doc, patterns, **kwargs):
+        def collect(events):
+            return lambda *event: events.append(event)
+
+        received = [[] for _ in patterns]
+        serial_json.tee(io.StringIO(doc), [
+            serial_json.Consumer(collect(events), paths, threaded=bool(i % 2))
+            for i, (paths, events) in enumerate(zip(patterns, received))
+        ], **kwargs)
+        for paths, events in zip(patterns, received):
+            expected = serial_json.load(io.StringIO(doc), paths=paths, **kwargs)
+            self.assertEqual(events, [tuple(event) for event in expected])
+
+    def test_consumers(self):
+        patterns = [['$.records[*].name'], ['$..name', '$.meta'], None,
+                    '$.records[1]', ['$.missing']]
+        for kwargs in ({}, {'terminators': True}, {'list_paths': True},
+                       {'lazy_paths': True, 'batch_size': 3}):
+            self.assertTee(self.doc, patterns, **kwargs)
+        self.assertTee(self.doc, patterns[:2], terminators=True)
+
+    def test_multi_document(self):
+        self.assertTee('{"a": 1}\n{"b": [2]}\n[3]', [['$.b'], None],
+                       multi_document=True)
+
+    def test_coroutine(self):
+        def sink(events):
+            try:
+                while True:
+                    events.append((yield))
+            except GeneratorExit:
+                events.append('closed')
+
+        events = []
+        coroutine = sink(events)
+        next(coroutine)
+        serial_json.tee(io.StringIO(self.doc), [
+            serial_json.Consumer(coroutine, '$.meta.count')])
+        self.assertEqual(events, [('$.meta.count', 2), 'closed'])
+
+    def test_errors(self):
+        def fail(path, value):
+            if value == 2:
+                raise KeyError(path)
+
+        for threaded in (False, True):
+            events = []
+            with self.assertRaises(KeyError):
+                serial_json.tee(io.StringIO(self.doc), [
+                    lambda *event: events.append(event),
+                    serial_json.Consumer(fail, '$..id', threaded=threaded,
+                                         queue_size=1),
+                ], batch_size=1)
+            if not threaded:
+                # the parse stops at the batch of the error
+                self.assertEqual(len(events), 4)
+        with self.assertRaises(ValueError):
+            serial_json.tee(io.StringIO(self.doc), [], paths='$')
+
+class TestColumns(unittest.TestCase):
+    doc = '''{"records": [
+        {"id": 1, "price": 2.5, "geo": {"region": "eu"}, "tags": ["a"]},
+        {"id": 2, "price": null, "geo": {}},
+        {},
+        {"id": 4, "price": 1, "geo": {"region": "us"}, "tags": ["b", "c"]},
+        [5]
+    ]}'''
+    fields = {'price': ('$.price', 'd'), 'region': '$.geo.region',
+              'tag': '$.tags[0]', 'last_tag': '$.tags[-1]', 'geo': 'geo'}
+
+    def columns(self, doc, **kwargs):
+        batches = list(serial_json.columns(
+            io.StringIO(doc), '$.records[*]', self.fields, **kwargs))
+        return dict((name, [value for batch in batches
+                            for value in batch[name]])
+                    for name in self.fields), batches
+
+    def test_columns(self):
+        for hybrid in (None, 4096):
+            columns, batches = self.columns(self.doc, hybrid=hybrid)
+            self.assertEqual(len(batches), 1)
+            prices = columns['price']
+            self.assertEqual((prices[0], prices[3]), (2.5, 1.0))
+            # missing and null prices are NaN
+            self.assertTrue(all(prices[i] != prices[i] for i in (1, 2, 4)))
+            self.assertEqual(columns['region'], ['eu', None, None, 'us', None])
+            self.assertEqual(columns['tag'], ['a', None, None, 'b', None])
+            # rows are whole values, so negative indices can be used
+            self.assertEqual(columns['last_tag'],
+                             ['a', None, None, 'c', None])
+            self.assertEqual(columns['geo'], [
+                {'region': 'eu'}, {}, None, {'region': 'us'}, None])
+
+    def test_batches(self):
+        columns, batches = self.columns(self.doc, batch_rows=2)
+        self.assertEqual([len(batch['tag']) for batch in batches], [2, 2, 1])
+        self.assertEqual(columns['tag'], ['a', None, None, 'b', None])
+        self.assertEqual(batches[0]['price'][0], 2.5)
+
+    def test_integers(self):
+        doc = '[{"id": 1, "n": -3}, {"id": 2.0, "n": 12}]'
+        batch, = serial_json.columns(io.StringIO(doc), '$[*]', [
+            ('id', ('id', 'l')), ('n', ('$.n', 'b'))])
+        self.assertEqual(list(batch['id']), [1, 2])
+        self.assertEqual(list(batch['n']), [-3, 12])
+        for doc in ('[{"id": 1.5}]', '[{"id": "1"}]', '[{"id": 1000}]'):
+            with self.assertRaises(ValueError):
+                list(serial_json.columns(io.StringIO(doc), '$[*]',
+                                         {'id': ('id', 'b')}))
+
+    def test_missing_integers(self):
+        doc = '[{"id": 1}, {}, {"id": null}, {"id": 4}]'
+        batch, = serial_json.columns(io.StringIO(doc), '$[*]',
+                                     {'id': ('id', 'b')})
+        mask = batch['id'].mask
+        self.assertEqual([bool(m) for m in mask], [False, True, True, False])
+        self.assertEqual([v for v, m in zip(batch['id'], mask) if not m],
+                         [1, 4])
+        with self.assertRaises(ValueError):
+            list(serial_json.columns(io.StringIO(doc), '$[*]',
+                                     {'id': ('id', 'b')}, strict=True))
+
+    def test_multi_document(self):
+        doc = '{"a": {"x": 1}}\n{"a": {"y": 2}}\n{"b": 3}'
+        batch, = serial_json.columns(
+            io.StringIO(doc), '$.a', {'x': ('x', 'd'), 'y': 'y'},
+            multi_document=True)
+        self.assertEqual(batch['x'][0], 1.0)
+        self.assertNotEqual(batch['x'][1], batch['x'][1])
+        self.assertEqual(batch['y'], [None, 2.0])
+
+class TestFollow(unittest.TestCase):
+    def setUp(self):
+        import shutil
+        import tempfile
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        self.filename = os.path.join(directory, 'log.jsonl')
+
+    def write(self, text, mode='a'):
+        with open(self.filename, mode) as fp:
+            fp.write(text)
+
+    def rotate(self):
+        os.rename(self.filename, self.filename + '.1')
+        self.write('{"n": 4}\n', 'w')
+
+    def follow(self, steps, **kwargs):
+        steps = list(steps)
+        waits = []
+
+        def wait(path, delay):
+            # changes the file whenever the follower waits for data
+            self.assertEqual(path, self.filename)
+            waits.append(delay)
+            if steps:
+                steps.pop(0)()
+        events = list(serial_json.follow(
+            self.filename, timeout=0.2, min_delay=0.001, max_delay=0.004,
+            wait=wait, **kwargs))
+        return events, waits
+
+    def test_follow(self):
+        events, waits = self.follow([
+            lambda: self.write('{"n": 1}\n{"n": 2', 'w'),
+            lambda: None,
+            lambda: self.write('}\n'),
+            lambda: self.write('{"n": 3}\n') or self.rotate(),
+            # truncated (to a shorter length, so it can be detected)
+            lambda: self.write('{"n":5}\n', 'w'),
+        ], paths='$.n')
+        self.assertEqual(events, [
+            (0, '$.n', 1.0), (1, '$.n', 2.0), (2, '$.n', 3.0),
+            (3, '$.n', 4.0), (4, '$.n', 5.0)])
+        # the delay backs off while idle, up to max_delay
+        self.assertEqual(waits[:4], [0.001, 0.001, 0.002, 0.001])
+        self.assertEqual(max(waits), 0.004)
+
+    def test_incomplete(self):
+        with self.assertRaises(ValueError):
+            self.follow([lambda: self.write('{"n": ', 'w')])
+        os.remove(self.filename)
+        self.assertEqual(self.follow([])[0], [])
+
+class TestPaths(unittest.TestCase):
+    doc = '''{
+        "records": [
+            {"id": 1, "meta": {"ts": 10, "tags": ["a", "b"]}, "skip": "x"},
+            {"id": 2, "meta": {"ts": 20}, "skip": {"id": "[{\\"}"}}
+        ],
+        "count": 2,
+        "other key": [1, 2]
+    }'''
+
+    def select(self, *paths, **kwargs):
+        return list(serial_json.loads(self.doc, paths=paths, **kwargs))
+
+    def test_wildcard(self):
+        self.assertEqual(self.select('$.records[*].id'), [
+            ('$.records[0].id', 1.0),
+            ('$.records[1].id', 2.0),
+        ])
+
+    def test_subtree(self):
+        self.assertEqual(self.select('$.records[0].meta'), [
+            ('$.records[0].meta.ts', 10.0),
+            ('$.records[0].meta.tags[0]', 'a'),
+            ('$.records[0].meta.tags[1]', 'b'),
+        ])
+
+    def test_recursive(self):
+        self.assertEqual(self.select('$..id'), [
+            ('$.records[0].id', 1.0),
+            ('$.records[1].id', 2.0),
+            ('$.records[1].skip.id', '[{"}'),
+        ])
+
+    def test_brackets(self):
+        self.assertEqual(self.select("$['other key'][1]", '$.count'), [
+            ('$.count', 2.0),
+            ("$['other key'][1]", 2.0),
+        ])
+
+    def test_terminators(self):
+        result = self.select('$.records[1].meta', terminators=True)
+        self.assertEqual([(path, str(value)) for path, value in result], [
+            ('$.records[1].meta', '<StartObject>'),
+            ('$.records[1].meta.ts', '20.0'),
+            ('$.records[1].meta', '<EndObject>'),
+        ])
+
+    def test_list_paths(self):
+        result = self.select('$.records[*].meta.ts', list_paths=True)
+        self.assertEqual([value for _, value in result], [10.0, 20.0])
+
+    def test_buffer_size(self):
+        expected = self.select('$..ts', '$..skip')
+        for size in range(1, 8):
+            self.assertEqual(
+                self.select('$..ts', '$..skip', buffer_size=size), expected)
+
+    def test_invalid_path(self):
+        self.assertRaises(ValueError, self.select, 'records')
+        self.assertRaises(ValueError, self.select, '$.records[')
+        # a streaming parser can not tell which element is the last
+        self.assertRaises(ValueError, self.select, '$.records[-1]')
+        self.assertRaises(ValueError, self.select, '$.records[0, -1].id')
+        self.assertRaises(ValueError, list, serial_json.items(
+            StringIO(self.doc), '$.records[-1]'))
+
+class TestItems(unittest.TestCase):
+    doc = TestPaths.doc
+
+    def test_items(self):
+        result = list(serial_json.items(StringIO(self.doc), '$.records[*]'))
+        self.assertEqual(result, json.loads(self.doc)['records'])
+
+    def test_scalars(self):
+        result = list(serial_json.items(StringIO(self.doc), '$..ts'))
+        self.assertEqual(result, [10.0, 20.0])
+
+    def test_nested(self):
+        result = list(serial_json.items(
+            StringIO('[[], {}, [{"a": []}], 1]'), '$[*]'))
+        self.assertEqual(result, [[], {}, [{'a': []}], 1.0])
+
+    def test_root(self):
+        result = list(serial_json.items(StringIO(self.doc), '$'))
+        self.assertEqual(result, [json.loads(self.doc)])
+
+    def test_multi_document(self):
+        doc = '{"a": [1]}\n{"b": 2}\n{"a": {"c": null}}'
+        result = list(serial_json.items(StringIO(doc), '$.a',
+                                        multi_document=True))
+        self.assertEqual(result, [[1.0], {'c': None}])
+
+    def test_paths(self):
+        parser = serial_json.loads(
+            self.doc, paths='$.records[*].meta', items=True)
+        self.assertEqual([path for path, _ in parser], [
+            '$.records[0].meta', '$.records[1].meta'])
+
 if __name__ == '__main__':
     unittest.main()
@@ -0,0 +1,320 @@
+'''Incremental writing of json from `(path, value)` events. '''
+
+from __future__ import print_function, unicode_literals
+
+from decimal import Decimal
+import io
+import json
+from json.encoder import encode_basestring, encode_basestring_ascii
+import re
+
+from .jsonpath import STRING_TYPES, Path, render_part
+from .serial_json import (
+    TEXT, EndArray, EndObject, NumberBlock, StartArray, StartObject,
+    StringChunk, StringEnd)
+
+# a segment of a jsonpath, as rendered by the parser (whose quoted keys have
+# quotes and backslashes escaped)
+_segment_pattern = re.compile(
+    r"""\.([a-zA-Z][a-zA-Z0-9_]*)|\[([0-9]+)\]|\['((?:[^'\\]|\\.)*)'\]""")
+_unescape_pattern = re.compile(r'\\(.)')
+
+_SEGMENT_CACHE_SIZE = 4096
+
+_INFINITY = float('inf')
+
+
+def _float_text(value):
+    '''Renders a float as `json` does. '''
+    if value != value:
+        return 'NaN'
+    elif value == _INFINITY:
+        return 'Infinity'
+    elif value == -_INFINITY:
+        return '-Infinity'
+    return float.__repr__(value)
+
+
+class Writer(object):
+    '''Writes json incrementally from the `(path, value)` events of a
+    `Parser`, with paths as jsonpath strings, lists or `Path`s. Collections
+    are opened and closed by terminator events, or, where these are missing,
+    inferred from the paths (so empty collections are lost). Chunked strings
+    and `NumberBlock`s are written as they come. Successive top level values
+    are written on separate lines.
+
+    Jsonpath strings are parsed, past the path of the innermost collection
+    opened by a terminator event where they extend it, so events from
+    parsers with `list_paths` or `lazy_paths` are written faster. '''
+    def __init__(self, out, ensure_ascii=True, separators=None,
+                 encoding='utf-8', buffer_size=64 * 1024):
+        '''Constructor.
+        :param out: A text or binary file-like object to write to.
+        :param ensure_ascii: Escape all non-ASCII characters, as `json` does.
+        :param separators: An `(item_separator, key_separator)` tuple, by
+                           default `(', ', ': ')`.
+        :param encoding: Encoding of binary output.
+        :param buffer_size: The number of characters buffered between writes
+                            to `out`.
+        '''
+        self.out = out
+        self.buffer_size = buffer_size
+        self._encoding = None
+        if isinstance(out, (io.RawIOBase, io.BufferedIOBase)) or (
+                'b' in getattr(out, 'mode', '')):
+            self._encoding = encoding
+        self._item_separator, self._key_separator = separators or (', ', ': ')
+        self._encode_string = (
+            encode_basestring_ascii if ensure_ascii else encode_basestring)
+        self._encoder = json.JSONEncoder(
+            ensure_ascii=ensure_ascii, separators=separators).encode
+        self._encoders = {
+            TEXT: self._encode_string,
+            int: int.__repr__,
+            float: _float_text,
+            bool: lambda value: 'true' if value else 'false',
+            type(None): lambda value: 'null',
+            Decimal: TEXT,
+        }
+        self._pieces = []
+        self._size = 0
+        # the parts, type, member count and path string of open collections
+        self._parts = []
+        self._objects = []
+        self._counts = []
+        self._strings = []
+        # parts by the path segment that renders them
+        self._segments = {}
+        # the parts of a chunked string being written
+        self._string = None
+        self._documents = 0
+        self._document = None
+
+    def write(self, path, value):
+        '''Writes one `(path, value)` event. '''
+        parts = path if path.__class__ is list else self._split(path)
+        cls = value.__class__
+        if self._string is not None:
+            if parts != self._string or (
+                    cls is not StringChunk and cls is not StringEnd):
+                raise ValueError('Unterminated string at {}'.format(
+                    self._path_text(self._string)))
+            if cls is StringEnd:
+                self._string = None
+                self._put('"')
+            else:
+                self._put(self._encode_string(value.value)[1:-1])
+            return
+        if cls is EndObject or cls is EndArray:
+            self._open(parts, cls is EndObject, path)
+            self._close(len(parts) - 1)
+            return
+        if cls is NumberBlock:
+            self._open(parts, False, path)
+            values = value.values
+            if hasattr(values, 'tolist'):
+                values = values.tolist()
+            text = self._item_separator.join(map(_float_text, values))
+            if self._counts[-1] and text:
+                text = self._item_separator + text
+            self._counts[-1] += len(values)
+            self._put(text)
+            return
+        prefix = self._member(parts)
+        if cls is StartObject or cls is StartArray:
+            is_object = cls is StartObject
+            self._push(parts[-1], is_object, path)
+            text = '{' if is_object else '['
+        elif cls is StringChunk:
+            self._string = parts
+            text = self._encode_string(value.value)[:-1]
+        elif cls is StringEnd:
+            # the end of a string without chunks
+            text = '""'
+        else:
+            encode = self._encoders.get(cls)
+            text = encode(value) if encode else self._encoder(value)
+        text = prefix + text
+        self._pieces.append(text)
+        self._size += len(text)
+        if self._size >= self.buffer_size:
+            self.flush()
+
+    def write_all(self, events):
+        '''Writes a stream of `(path, value)` events, or the `(document,
+        path, value)` events of a multi_document parser, then closes the
+        output's open collections. Returns the writer. '''
+        write = self.write
+        for event in events:
+            if len(event) == 3:
+                document, path, value = event
+                if document != self._document:
+                    self.end_document()
+                    self._document = document
+                write(path, value)
+            else:
+                write(*event)
+        self.close()
+        return self
+
+    def end_document(self):
+        '''Closes all open collections, so the next event starts a new top
+        level value. '''
+        if self._string is not None:
+            raise ValueError('Unterminated string at {}'.format(
+                self._path_text(self._string)))
+        self._close(0)
+
+    def flush(self):
+        '''Writes the buffered output. '''
+        if self._pieces:
+            text = ''.join(self._pieces)
+            del self._pieces[:]
+            self._size = 0
+            self.out.write(
+                text if self._encoding is None else text.encode(
+                    self._encoding))
+
+    def close(self):
+        '''Closes all open collections, and flushes the output (which is left
+        open). '''
+        self.end_document()
+        self.flush()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, error, *args):
+        if error is None:
+            self.close()
+
+    def _put(self, text):
+        '''Buffers output text. '''
+        self._pieces.append(text)
+        self._size += len(text)
+        if self._size >= self.buffer_size:
+            self.flush()
+
+    def _split(self, path):
+        '''Returns the parts of a path as a list. A jsonpath string which
+        extends that of the innermost open collection is only parsed past it,
+        and single segments are cached. '''
+        if path.__class__ is Path:
+            return list(path.parts)
+        elif not isinstance(path, STRING_TYPES):
+            return list(path)
+        top = self._strings[-1] if self._strings else None
+        if top is not None and path.startswith(top):
+            # with terminators, events are the members of the innermost open
+            # collection (or its end), so the rest of the path is one segment
+            segment = path[len(top):]
+            if not segment:
+                return list(self._parts)
+            part = self._segments.get(segment, self._segments)
+            if part is not self._segments:
+                return self._parts + [part]
+            match = _segment_pattern.match(segment)
+            if match and match.end() == len(segment):
+                part = self._part(match)
+                if part.__class__ is not int:
+                    # indices are not cached
+                    if len(self._segments) >= _SEGMENT_CACHE_SIZE:
+                        self._segments.clear()
+                    self._segments[segment] = part
+                return self._parts + [part]
+        parts = None
+        if path.startswith('$'):
+            parts = self._parse(path, 1, ['$'])
+        if parts is None:
+            raise ValueError("Invalid path '{}'".format(path))
+        return parts
+
+    @staticmethod
+    def _parse(path, offset, parts):
+        '''Appends the parts of a jsonpath from `offset` to `parts`, returning
+        them, or None if it is not a path rendered by the parser. '''
+        while offset < len(path):
+            match = _segment_pattern.match(path, offset)
+            if not match:
+                return None
+            parts.append(Writer._part(match))
+            offset = match.end()
+        return parts
+
+    @staticmethod
+    def _part(match):
+        '''Returns the key or index of a `_segment_pattern` match. '''
+        key, index, quoted = match.groups()
+        if index is not None:
+            return int(index)
+        elif key is not None:
+            return key
+        return _unescape_pattern.sub(r'\1', quoted)
+
+    def _member(self, parts):
+        '''Makes the parent of `parts` the innermost open collection, and
+        returns the text that precedes a new member at `parts`. '''
+        parent = self._parts
+        depth = len(parts) - 1
+        if len(parent) != depth or parent != parts[:-1]:
+            common = 0
+            limit = min(len(parent), depth)
+            while common < limit and parent[common] == parts[common]:
+                common += 1
+            self._close(common)
+            # infer the collections the events did not start
+            while len(parent) < depth:
+                part = parts[len(parent)]
+                is_object = not isinstance(parts[len(parent) + 1], int)
+                self._put(self._member(parts[:len(parent) + 1]) + (
+                    '{' if is_object else '['))
+                self._push(part, is_object, None)
+        if not depth:
+            # a new top level value
+            self._documents += 1
+            return '\n' if self._documents > 1 else ''
+        part = parts[-1]
+        if self._objects[-1] != (part.__class__ is not int):
+            raise ValueError('Can not write {} in an {}'.format(
+                self._path_text(parts),
+                'object' if self._objects[-1] else 'array'))
+        count = self._counts[-1]
+        self._counts[-1] = count + 1
+        prefix = self._item_separator if count else ''
+        if self._objects[-1]:
+            return prefix + self._encode_string(
+                part or '') + self._key_separator
+        return prefix
+
+    def _open(self, parts, is_object, path):
+        '''Makes the collection at `parts` the innermost open collection,
+        starting it if it is not open. '''
+        depth = len(parts)
+        if self._parts[:depth] == parts:
+            self._close(depth)
+            if self._objects[-1] != is_object:
+                raise ValueError('Mismatched collection at {}'.format(
+                    self._path_text(parts)))
+        else:
+            self._put(self._member(parts) + ('{' if is_object else '['))
+            self._push(parts[-1], is_object, path)
+
+    def _push(self, part, is_object, path):
+        '''Enters a collection. '''
+        self._parts.append(part)
+        self._objects.append(is_object)
+        self._counts.append(0)
+        self._strings.append(path if isinstance(path, STRING_TYPES) else None)
+
+    def _close(self, depth):
+        '''Ends the open collections deeper than `depth`. '''
+        while len(self._parts) > depth:
+            self._parts.pop()
+            self._counts.pop()
+            self._strings.pop()
+            self._put('}' if self._objects.pop() else ']')
+
+    @staticmethod
+    def _path_text(parts):
+        '''Renders parts as a jsonpath, for error messages. '''
+        return '$' + ''.join(render_part(part) for part in parts[1:])
@@ -7,5 +7,5 @@ setup(name='serial_json',
       author='Stephen O\'Connor',
       author_email='oconnor39@gmail.com',
       license='MIT',
-      packages=['serial_json'],
+      packages=['serial_json', 'serial_json.benchmarks'],
       zip_safe=False)
\ No newline at end of file